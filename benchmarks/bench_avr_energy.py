@@ -0,0 +1,62 @@
+"""
+Benchmark of Silence.activateEnergy.avr_energy: per-sample loop vs cumulative-sum backend.
+
+The loop backend is timed on a prefix of the signal and extrapolated linearly to the full
+length (its cost per output sample is constant), unless --full-loop is given.
+
+Usage:
+    python benchmarks/bench_avr_energy.py [--window-ms 5] [--full-loop]
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from fonoSemillIAS.Silence.activateEnergy import avr_energy, shannon_energy
+
+DURATIONS_MIN = [1, 10, 60]
+SAMPLING_RATES = [16000, 44100]
+LOOP_PREFIX_SAMPLES = 200000
+
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--full-loop", action="store_true")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", RuntimeWarning)
+    rng = np.random.default_rng(0)
+
+    print(f"{'fs (Hz)':>8} {'min':>4} {'loop (s)':>10} {'cumsum (s)':>11} {'speedup':>9} {'max |diff|':>11}")
+    for fs in SAMPLING_RATES:
+        window = int(args.window_ms * 0.001 * fs)
+        for minutes in DURATIONS_MIN:
+            n = int(minutes * 60 * fs)
+            energy = shannon_energy(rng.uniform(-1, 1, n).astype(np.float32))
+
+            t_fast, fast = timeit(avr_energy, energy, window)
+
+            if args.full_loop:
+                t_loop, loop = timeit(avr_energy, energy, window, method="loop")
+                diff = np.max(np.abs(loop - fast))
+            else:
+                prefix = min(n, LOOP_PREFIX_SAMPLES)
+                t_prefix, loop = timeit(avr_energy, energy[:prefix], window, method="loop")
+                t_loop = t_prefix * n / prefix
+                # Compare only the samples whose window does not reach the end of the prefix
+                valid = prefix - window // 2
+                diff = np.max(np.abs(loop[:valid] - fast[:valid]))
+
+            print(f"{fs:>8} {minutes:>4} {t_loop:>10.2f} {t_fast:>11.3f} {t_loop / t_fast:>8.0f}x {diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark and equivalence check of Silence.activateEnergy.detect_silences: numba kernel vs NumPy path.
+
+The equivalence cases cover short signals, windows larger than the signal, silent signals and
+noisy signals with hundreds of thousands of zero crossings; every backend must return exactly
+the intervals of the step-by-step functions. The timings include the original per-lobe loop
+(identify_lobes/identify_silence as they were written before the vectorized versions).
+
+Usage:
+    python benchmarks/bench_silence_kernel.py [--window-ms 5] [--minutes 2]
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from fonoSemillIAS.Silence import activateEnergy as ae
+
+FS = 16000
+
+
+def reference(signal, window_move, lobes_loop=False):
+    average_energy = ae.avr_energy(ae.shannon_energy(signal), window_move)
+    envelogram = ae.envelogram(average_energy)
+    zero_crossings = ae.find_zero_crossings(envelogram)
+    if not lobes_loop:
+        lobes = ae.identify_lobes(envelogram, zero_crossings)
+        return ae.identify_silence(envelogram, lobes)
+    # Original per-lobe Python loop
+    lobes, start = [], 0
+    for zero_crossing in zero_crossings:
+        lobes.append((start, zero_crossing))
+        start = zero_crossing
+    lobes.append((start, len(envelogram) - 1))
+    return [(i, j) for i, j in lobes if np.mean(envelogram[i:j]) < 0]
+
+
+def equivalence_cases(rng):
+    for n in [1, 2, 3, 10, 1000, 3 * FS]:
+        for window_move in [0, 1, 2, 80, 200]:
+            signal = rng.normal(size=n) * (np.arange(n) // 700 % 2)
+            peak = np.max(np.abs(signal))
+            yield f"bursts n={n} w={window_move}", signal / peak if peak > 0 else signal, window_move
+    yield "zeros", np.zeros(1000), 80
+    yield "silence then noise", np.concatenate([np.zeros(5000), rng.uniform(-1, 1, 5000)]), 40
+    yield "white noise w=2", rng.uniform(-1, 1, 10 * FS), 2
+
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--minutes", type=float, default=2)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", RuntimeWarning)
+    rng = np.random.default_rng(0)
+    backends = ["numpy"] + ([] if ae.njit is None else ["numba"])
+
+    failures = 0
+    for name, signal, window_move in equivalence_cases(rng):
+        expected = reference(signal, window_move, lobes_loop=True)
+        for backend in backends:
+            if ae.detect_silences(signal, window_move, backend=backend) != expected:
+                failures += 1
+                print(f"MISMATCH {backend}: {name}")
+    print(f"Equivalence: {failures} mismatches ({', '.join(backends)})")
+
+    # Warm up the compilation before timing
+    ae.detect_silences(np.zeros(10), 2)
+    n = int(args.minutes * 60 * FS)
+    window_move = int(args.window_ms * 0.001 * FS)
+    signals = {"speech-like": rng.normal(size=n) * (1 + np.sin(np.arange(n) / 3000)),
+               "white noise": rng.uniform(-1, 1, n)}
+    print(f"{'signal':>12} {'lobes':>8} {'loop (s)':>9} " + " ".join(f"{b + ' (s)':>10}" for b in backends))
+    for name, signal in signals.items():
+        signal = signal / np.max(np.abs(signal))
+        t_loop, expected = timeit(reference, signal, window_move, lobes_loop=True)
+        times = []
+        for backend in backends:
+            t_backend, intervals = timeit(ae.detect_silences, signal, window_move, backend=backend)
+            assert intervals == expected, f"{backend} differs on {name}"
+            times.append(t_backend)
+        print(f"{name:>12} {len(expected):>8} {t_loop:>9.2f} " + " ".join(f"{t:>10.2f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
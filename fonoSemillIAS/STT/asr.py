@@ -1,7 +1,10 @@
+import os
+import numpy as np
 import nemo.collections.asr as nemo_asr
 from omegaconf import OmegaConf, open_dict
 
 from fonoSemillIAS.others import print_helpers as pp
+from fonoSemillIAS.STT.registry import model_registry
 
 class NeMo_ASR():
     def __init__(self, name_model:str, debug: bool = False) -> None:
@@ -19,6 +22,11 @@ class NeMo_ASR():
 
 
     def create_model(self):
+        # Shared by every NeMo_ASR of the process with the same model and decoding config
+        key = ("nemo", self.name_model, "preserve_alignments", "compute_timestamps")
+        return model_registry.get(key, self.load_model)
+
+    def load_model(self):
         try:
             asr_model = nemo_asr.models.ASRModel.from_pretrained(self.name_model)
         except Exception as e:
@@ -50,24 +58,11 @@ class NeMo_ASR():
         try:
             if type(hypotheses) == tuple and len(hypotheses) == 2:
                 hypotheses = hypotheses[0]
-            timestamp_dict = hypotheses[0].timestep # extract timesteps from hypothesis of first (and only) audio file
-
-            # For a FastConformer model, you can display the word timestamps as follows:
-            # 40ms is duration of a timestep at output of the Conformer
-            time_stride = 4 * self.model.cfg.preprocessor.window_stride
-
-            word_timestamps = timestamp_dict['word']
-
-            text = ""
-            vec_timestamps = []
-            for stamp in word_timestamps:
-                stamp['start_offset'] = stamp['start_offset'] * time_stride
-                stamp['end_offset'] = stamp['end_offset'] * time_stride
-                word = stamp['char'] if 'char' in stamp else stamp['word']
+            # extract timesteps from hypothesis of first audio file
+            text, words, start_offset, end_offset = self.word_timestamps(hypotheses[0])
 
-                # print(f"Time : {stamp['start_offset']:0.2f} - {stamp['end_offset']:0.2f} - {word}")
-                text += " " + word
-                vec_timestamps.append(stamp)
+            vec_timestamps = [dict(stamp, start_offset=start, end_offset=end)
+                              for stamp, start, end in zip(hypotheses[0].timestep['word'], start_offset, end_offset)]
 
         except Exception as e:
             print(e)
@@ -80,4 +75,70 @@ class NeMo_ASR():
             print("- Num of timestamps:", len(vec_timestamps))
             pp.printc("----------------------------")
 
-        return text, vec_timestamps
\ No newline at end of file
+        return text, vec_timestamps
+
+    def apply_batch(self, files:list, batch_size:int = 4, sort_by_length:bool = True):
+        """
+        Transcribe several files and return the text and word timestamps of every one.
+
+        Args:
+        - files (list): Paths of the audio files.
+        - batch_size (int): Number of files per forward pass. Default is 4.
+        - sort_by_length (bool): Group files of similar length in the same batch (by file size)
+          to reduce padding. Results are returned in input order anyway. Default is True.
+
+        Returns:
+        - results (list): One dict per file, in input order, with "text" and the arrays
+          "word", "start_offset" and "end_offset" (seconds).
+        """
+        if self.debug: pp.printc(f"\t Start ASR process: {len(files)} files")
+
+        order = list(range(len(files)))
+        if sort_by_length:
+            order = sorted(order, key=lambda k: os.path.getsize(files[k]))
+
+        try:
+            hypotheses = self.model.transcribe([files[k] for k in order], batch_size=batch_size, return_hypotheses=True)
+        except Exception as e:
+            print(e)
+            raise Exception("Error apply ASR and Hypotheses timestamps")
+
+        try:
+            if type(hypotheses) == tuple and len(hypotheses) == 2:
+                hypotheses = hypotheses[0]
+
+            results = [None] * len(files)
+            for k, hypothesis in zip(order, hypotheses):
+                text, words, start_offset, end_offset = self.word_timestamps(hypothesis)
+                results[k] = {"text": text, "word": words, "start_offset": start_offset, "end_offset": end_offset}
+        except Exception as e:
+            print(e)
+            raise Exception("Error transform transcript")
+
+        if self.debug:
+            print("\tFinish ASR")
+            pp.printc("----------------------------")
+
+        return results
+
+    def word_timestamps(self, hypothesis):
+        """
+        Text and word timestamps (seconds) of a hypothesis.
+
+        Returns:
+        - text (str): Transcript, one space before every word.
+        - words (list): Words.
+        - start_offset (np.array): Start of every word in seconds.
+        - end_offset (np.array): End of every word in seconds.
+        """
+        # For a FastConformer model, you can display the word timestamps as follows:
+        # 40ms is duration of a timestep at output of the Conformer
+        time_stride = 4 * self.model.cfg.preprocessor.window_stride
+
+        word_timestamps = hypothesis.timestep['word']
+        words = [stamp['char'] if 'char' in stamp else stamp['word'] for stamp in word_timestamps]
+        start_offset = np.array([stamp['start_offset'] for stamp in word_timestamps], dtype=float) * time_stride
+        end_offset = np.array([stamp['end_offset'] for stamp in word_timestamps], dtype=float) * time_stride
+
+        text = "".join(" " + word for word in words)
+        return text, words, start_offset, end_offset
@@ -1,12 +1,16 @@
 from nemo.collections.asr.parts.utils.decoder_timestamps_utils import ASRDecoderTimeStamps
 from nemo.collections.asr.parts.utils.diarization_utils import OfflineDiarWithASR
+from nemo.collections.asr.parts.utils.speaker_utils import audio_rttm_map
 import os
 import wget
 from omegaconf import OmegaConf
 import shutil
 import json
+import uuid
+import copy
 
 from fonoSemillIAS.others import print_helpers as pp
+from fonoSemillIAS.STT.registry import model_registry
 
 class DiarizationAsr():
     def __init__(self, work_path: str, conf_infence:str, 
@@ -36,16 +40,48 @@ class DiarizationAsr():
         if debug: 
             pp.printy("-----------------------")
 
-    def create_model(self):
+    def model_key(self):
+        return ("nemo_diar_asr", self.ASR_model, self.conf_file)
+
+    def create_model(self, manifest_filepath: str = None):
+        """
+        Shared decoder and ASR model, with the file list of the decoder set to the manifest.
+
+        The decoder is shared by every instance with the same model: hold model_registry.lock(self.model_key())
+        from this call until run_ASR returns, or another thread may change the file list in between.
+        """
         if self.debug: pp.printc("\t** Create model**")
         try:
-            decoder = ASRDecoderTimeStamps(self.confg.diarizer)
-            model = decoder.set_asr_model()
+            # The ASR model is loaded once per process and shared between files and instances
+            decoder, model = model_registry.get(self.model_key(), self.load_model)
+
+            # The decoder reads the file list of the manifest when it is built: refresh it
+            decoder.manifest_filepath = manifest_filepath or self.confg.diarizer.manifest_filepath
+            decoder.AUDIO_RTTM_MAP = audio_rttm_map(decoder.manifest_filepath)
+            decoder.audio_file_list = [value['audio_filepath'] for _, value in decoder.AUDIO_RTTM_MAP.items()]
             return decoder, model
         except Exception as e:
             print(e)
             raise Exception("Error create model")
 
+    def run_asr(self, manifest_filepath: str = None):
+        """
+        ASR of the files of a manifest with the shared decoder, holding its lock.
+
+        Returns:
+        - word_hyp, word_ts_hyp: As returned by run_ASR, keyed by file name without extension.
+        - word_ts_anchor_offset (float): Offset of the word timestamps of the decoder.
+        """
+        with model_registry.lock(self.model_key()):
+            decoder_ts, model = self.create_model(manifest_filepath = manifest_filepath)
+            word_hyp, word_ts_hyp = decoder_ts.run_ASR(model)
+            return word_hyp, word_ts_hyp, decoder_ts.word_ts_anchor_offset
+
+    def load_model(self):
+        decoder = ASRDecoderTimeStamps(self.confg.diarizer)
+        model = decoder.set_asr_model()
+        return decoder, model
+
     def open_config(self):
 
         if self.debug: 
@@ -92,27 +128,29 @@ class DiarizationAsr():
             print(e)
             raise Exception("Error in load config file")
         
-    def create_meta(self):
+    def create_meta(self, filepaths: list = None, path_inferece: str = None):
         if self.debug: 
             pp.printc("\t** Meta file **")
 
-        meta = {
-            # 'audio_filepath': files_paths['95 MHG']["C"], # Name file (Original)
-            'audio_filepath': self.filepath, # Name file (Filter)
-            'offset': 0,
-            'duration':None,
-            'label': 'infer',
-            'text': '-',
-            'num_speakers': 2,
-            'rttm_filepath': None,
-            'uem_filepath' : None
-        }
-
-        path_inferece = os.path.join(self.work_path,'input_manifest.json')
+        # One manifest line per file
+        filepaths = [self.filepath] if filepaths is None else filepaths
+        path_inferece = path_inferece or os.path.join(self.work_path,'input_manifest.json')
 
         with open(path_inferece,'w') as fp:
-            json.dump(meta,fp)
-            fp.write('\n')
+            for filepath in filepaths:
+                meta = {
+                    # 'audio_filepath': files_paths['95 MHG']["C"], # Name file (Original)
+                    'audio_filepath': filepath, # Name file (Filter)
+                    'offset': 0,
+                    'duration':None,
+                    'label': 'infer',
+                    'text': '-',
+                    'num_speakers': 2,
+                    'rttm_filepath': None,
+                    'uem_filepath' : None
+                }
+                json.dump(meta,fp)
+                fp.write('\n')
         
     def set_file(self, filepath:str):
         path_inferece = os.path.join(self.work_path,'input_manifest.json')
@@ -140,12 +178,10 @@ class DiarizationAsr():
         try:
             self.set_file(filepath = file)
             
-            decoder_ts, model = self.create_model()
-
-            word_hyp, word_ts_hyp = decoder_ts.run_ASR(model)
+            word_hyp, word_ts_hyp, word_ts_anchor_offset = self.run_asr()
 
             asr_diar_offline = OfflineDiarWithASR(self.confg.diarizer)
-            asr_diar_offline.word_ts_anchor_offset = decoder_ts.word_ts_anchor_offset
+            asr_diar_offline.word_ts_anchor_offset = word_ts_anchor_offset
 
             diar_hyp, diar_score = asr_diar_offline.run_diarization(self.confg, word_ts_hyp)
 
@@ -155,4 +191,59 @@ class DiarizationAsr():
         except Exception as e:
             print(e)
             raise Exception("Error apply Diariztion and ASR")
-    
\ No newline at end of file
+
+    def apply_batch(self, files: list, job_id: str = None):
+        """
+        Apply diarization and ASR to several files in a single run.
+
+        All the files go in one manifest, so VAD, speaker embeddings, clustering and ASR are run
+        once over the batch. Each job writes its manifest and outputs in its own directory
+        (work_path/jobs/<job_id>), so parallel jobs do not overwrite each other.
+
+        Args:
+        - files (list): Paths of the audio files.
+        - job_id (str): Name of the job directory. Default is a random id.
+
+        Returns:
+        - results (dict): file -> {"word_hyp", "word_ts_hyp", "diar_hyp", "transcription_path"}
+        - diar_score: Diarization score of the batch.
+        """
+        if self.debug: pp.printc(f"\t Start ASR process: batch of {len(files)} files")
+
+        # NeMo keys the results by the file name without extension
+        uniq_ids = [os.path.splitext(os.path.basename(file))[0] for file in files]
+        assert len(set(uniq_ids)) == len(uniq_ids), "The files of a batch must have different names"
+
+        try:
+            job_id = job_id or uuid.uuid4().hex
+            job_path = os.path.join(self.work_path, "jobs", job_id)
+            os.makedirs(job_path, exist_ok=True)
+
+            manifest_filepath = os.path.join(job_path, 'input_manifest.json')
+            self.create_meta(filepaths = files, path_inferece = manifest_filepath)
+
+            confg = copy.deepcopy(self.confg)
+            confg.diarizer.out_dir = os.path.join(job_path, "output")
+            confg.diarizer.manifest_filepath = manifest_filepath
+
+            word_hyp, word_ts_hyp, word_ts_anchor_offset = self.run_asr(manifest_filepath = manifest_filepath)
+
+            asr_diar_offline = OfflineDiarWithASR(confg.diarizer)
+            asr_diar_offline.word_ts_anchor_offset = word_ts_anchor_offset
+
+            diar_hyp, diar_score = asr_diar_offline.run_diarization(confg, word_ts_hyp)
+
+            asr_diar_offline.get_transcript_with_speaker_labels(diar_hyp, word_hyp, word_ts_hyp)
+
+            results = {}
+            for file, uniq_id in zip(files, uniq_ids):
+                results[file] = {
+                    "word_hyp": word_hyp[uniq_id],
+                    "word_ts_hyp": word_ts_hyp[uniq_id],
+                    "diar_hyp": diar_hyp[uniq_id],
+                    "transcription_path": os.path.join(confg.diarizer.out_dir, "pred_rttms", f"{uniq_id}.json"),
+                }
+            return results, diar_score
+        except Exception as e:
+            print(e)
+            raise Exception("Error apply Diariztion and ASR")
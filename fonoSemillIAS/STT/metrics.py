@@ -1,58 +1,32 @@
 from typing import Any
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
 import jiwer
 from rouge_score import rouge_scorer
 
 from fonoSemillIAS.others import print_helpers as pp
 
+OP_OK = 0
+OP_SUB = 1
+OP_INS = 2
+OP_DEL = 3
 
-def wer( ref, hyp, return_comparate, debug):
+def wer( ref, hyp, return_comparate, debug, linear_memory: bool = False):
 
     r = ref.split()
     h = hyp.split()
-    #costs will holds the costs, like in the Levenshtein distance algorithm
-    costs = [[0 for inner in range(len(h)+1)] for outer in range(len(r)+1)]
-    # backtrace will hold the operations we've done.
-    # so we could later backtrace, like the WER algorithm requires us to.
-    backtrace = [[0 for inner in range(len(h)+1)] for outer in range(len(r)+1)]
-
-    OP_OK = 0
-    OP_SUB = 1
-    OP_INS = 2
-    OP_DEL = 3
-
-    DEL_PENALTY=1 # Tact
-    INS_PENALTY=1 # Tact
-    SUB_PENALTY=1 # Tact
-    # First column represents the case where we achieve zero
-    # hypothesis words by deleting all reference words.
-    for i in range(1, len(r)+1):
-        costs[i][0] = DEL_PENALTY*i
-        backtrace[i][0] = OP_DEL
-
-    # First row represents the case where we achieve the hypothesis
-    # by inserting all hypothesis words into a zero-length reference.
-    for j in range(1, len(h) + 1):
-        costs[0][j] = INS_PENALTY * j
-        backtrace[0][j] = OP_INS
-
-    # computation
-    for i in range(1, len(r)+1):
-        for j in range(1, len(h)+1):
-            if r[i-1] == h[j-1]:
-                costs[i][j] = costs[i-1][j-1]
-                backtrace[i][j] = OP_OK
-            else:
-                substitutionCost = costs[i-1][j-1] + SUB_PENALTY # penalty is always 1
-                insertionCost    = costs[i][j-1] + INS_PENALTY   # penalty is always 1
-                deletionCost     = costs[i-1][j] + DEL_PENALTY   # penalty is always 1
-
-                costs[i][j] = min(substitutionCost, insertionCost, deletionCost)
-                if costs[i][j] == substitutionCost:
-                    backtrace[i][j] = OP_SUB
-                elif costs[i][j] == insertionCost:
-                    backtrace[i][j] = OP_INS
-                else:
-                    backtrace[i][j] = OP_DEL
+
+    if not (debug or return_comparate):
+        # Only the counts: no backtrace matrix is kept
+        numSub, numDel, numIns = _edit_counts(*tokens2ids(r, h))
+        numCor = len(r) - numSub - numDel
+        wer_result = round( (numSub + numDel + numIns) / (float) (len(r)), 3)
+        return {'WER':wer_result, 'Cor':numCor, 'Sub':numSub, 'Ins':numIns, 'Del':numDel}
+
+    # operations will hold the operations we've done, from the end of both texts.
+    # linear_memory recovers them without the full backtrace matrix.
+    operations = _backtrace_operations(*tokens2ids(r, h), linear_memory = linear_memory)
 
     # back trace though the best route:
     i = len(r)
@@ -64,28 +38,28 @@ def wer( ref, hyp, return_comparate, debug):
     if debug or return_comparate:
         lines = []
         compares = []
-    while i > 0 or j > 0:
-        if backtrace[i][j] == OP_OK:
+    for op in operations:
+        if op == OP_OK:
             numCor += 1
             i-=1
             j-=1
             if debug or return_comparate:
                 lines.append("OK\t" + r[i]+"\t"+h[j])
                 compares.append(colored(255, 255, 255, h[j]))
-        elif backtrace[i][j] == OP_SUB:
+        elif op == OP_SUB:
             numSub +=1
             i-=1
             j-=1
             if debug or return_comparate:
                 lines.append("SUB\t" + r[i]+"\t"+h[j])
                 compares.append(colored(0, 255, 0, h[j]) +  colored(0, 0, 0, f'({r[i]})'))
-        elif backtrace[i][j] == OP_INS:
+        elif op == OP_INS:
             numIns += 1
             j-=1
             if debug or return_comparate:
                 lines.append("INS\t" + "****" + "\t" + h[j])
                 compares.append(colored(0, 0, 255, h[j]))
-        elif backtrace[i][j] == OP_DEL:
+        elif op == OP_DEL:
             numDel += 1
             i-=1
             if debug:
@@ -117,6 +91,214 @@ def wer( ref, hyp, return_comparate, debug):
         return {'WER':wer_result, 'Cor':numCor, 'Sub':numSub, 'Ins':numIns, 'Del':numDel}
 
 
+def tokens2ids(r, h):
+    """
+    Map the tokens of the reference and the hypothesis to integer ids of a shared vocabulary.
+
+    Args:
+    - r (list): Reference tokens.
+    - h (list): Hypothesis tokens.
+
+    Returns:
+    - tuple: (r_ids, h_ids) integer arrays.
+    """
+    vocabulary = {}
+    r_ids = np.array([vocabulary.setdefault(token, len(vocabulary)) for token in r], dtype=np.int64)
+    h_ids = np.array([vocabulary.setdefault(token, len(vocabulary)) for token in h], dtype=np.int64)
+    return r_ids, h_ids
+
+def _edit_rows(r_ids, h_ids, previous=None):
+    """
+    Levenshtein DP of wer, one row at a time.
+
+    Each row is computed with NumPy: substitutions and deletions come from the previous row and
+    the chain of insertions along the row is a running minimum of (cost - j) + j.
+
+    Args:
+    - r_ids (array): Reference ids, one DP row each.
+    - h_ids (array): Hypothesis ids.
+    - previous (array): Costs of the row above the first one. Default is the row 0 of wer.
+
+    Yields:
+    - tuple: (row costs, row operations) for each reference id, with the same tie-breaking
+      as wer (OK, then SUB, then INS, then DEL).
+    """
+    m = len(h_ids)
+    columns = np.arange(m + 1)
+    if previous is None:
+        previous = columns.copy()  # Row 0: insert all hypothesis words
+    for r_id in r_ids:
+        match = h_ids == r_id
+        diagonal = previous[:-1] + np.where(match, 0, 1)
+        deletion = previous[1:] + 1
+
+        best = np.empty(m + 1, dtype=np.int64)
+        best[0] = previous[0] + 1
+        np.minimum(diagonal, deletion, out=best[1:])
+        costs = np.minimum.accumulate(best - columns) + columns
+
+        operations = np.full(m + 1, OP_DEL, dtype=np.uint8)
+        insertion = costs[:-1] + 1
+        operations[1:][costs[1:] == insertion] = OP_INS
+        operations[1:][costs[1:] == diagonal] = OP_SUB
+        operations[1:][match] = OP_OK
+
+        yield costs, operations
+        previous = costs
+
+def _edit_counts(r_ids, h_ids):
+    """
+    Sub/Del/Ins counts of the wer alignment with O(len(h_ids)) memory.
+
+    The counts of the path chosen by the backtrace are carried forward row by row.
+    """
+    m = len(h_ids)
+    columns = np.arange(m + 1)
+    costs = columns.copy()
+    substitutions = np.zeros(m + 1, dtype=np.int64)
+    deletions = np.zeros(m + 1, dtype=np.int64)
+    for costs, operations in _edit_rows(r_ids, h_ids):
+        new_substitutions = np.empty(m + 1, dtype=np.int64)
+        new_deletions = np.empty(m + 1, dtype=np.int64)
+        # Diagonal (OK/SUB) and deletion come from the previous row
+        new_substitutions[1:] = substitutions[:-1] + (operations[1:] == OP_SUB)
+        new_deletions[1:] = deletions[:-1]
+        is_deletion = operations == OP_DEL
+        new_substitutions[is_deletion] = substitutions[is_deletion]
+        new_deletions[is_deletion] = deletions[is_deletion] + 1
+        # Insertions copy the counts of the last non-insertion cell of the row
+        source = np.maximum.accumulate(np.where(operations == OP_INS, 0, columns))
+        substitutions, deletions = new_substitutions[source], new_deletions[source]
+
+    numSub, numDel = int(substitutions[-1]), int(deletions[-1])
+    return numSub, numDel, int(costs[-1]) - numSub - numDel
+
+def _edit_backtrace(r_ids, h_ids, previous=None):
+    """
+    Backtrace matrix of the wer alignment, len(r_ids) x (len(h_ids)+1) uint8 operations
+    (the row 0 of wer is not included).
+    """
+    backtrace = np.empty((len(r_ids), len(h_ids) + 1), dtype=np.uint8)
+    for i, (_, operations) in enumerate(_edit_rows(r_ids, h_ids, previous)):
+        backtrace[i] = operations
+    return backtrace
+
+def _walk_backtrace(backtrace, j, operations):
+    """
+    Follow a backtrace matrix from its last row at column j up to the row above it.
+    Appends the operations and returns the column where the path leaves the matrix.
+    """
+    i = len(backtrace)
+    while i > 0:
+        op = int(backtrace[i-1, j])
+        operations.append(op)
+        if op != OP_INS:
+            i -= 1
+        if op != OP_DEL:
+            j -= 1
+    return j
+
+# Largest block (cells) aligned with a full backtrace matrix in linear-memory mode
+_BLOCK_CELLS = 1 << 22
+
+def _align_block(r_ids, h_ids, previous, operations):
+    """
+    Divide-and-conquer alignment of the rows r_ids below the row `previous`, ending at the last column.
+
+    The path of the full-matrix backtrace is recovered exactly: a forward pass labels every cell
+    below the middle row with the middle-row column its backtrace path goes through, so the
+    middle cell of the path is known and both halves are solved independently. Only the columns
+    up to the end of the path matter, since a DP cell depends only on cells to its left and above.
+    Appends the operations (from the end) and returns the column where the path leaves the block.
+    """
+    m = len(h_ids)
+    if len(r_ids) <= 1 or len(r_ids) * (m + 1) <= _BLOCK_CELLS:
+        return _walk_backtrace(_edit_backtrace(r_ids, h_ids, previous), m, operations)
+
+    middle = len(r_ids) // 2
+    columns = np.arange(m + 1)
+    for k, (costs, row_operations) in enumerate(_edit_rows(r_ids, h_ids, previous)):
+        if k + 1 == middle:
+            middle_row = costs
+            labels = columns
+        elif k + 1 > middle:
+            # OK/SUB come from the column on the left, DEL from the same column, INS from the row itself
+            labels = np.where(row_operations == OP_DEL, labels, np.concatenate([[0], labels[:-1]]))
+            labels = labels[np.maximum.accumulate(np.where(row_operations == OP_INS, 0, columns))]
+    crossing = int(labels[-1])
+
+    _align_block(r_ids[middle:], h_ids, middle_row, operations)
+    return _align_block(r_ids[:middle], h_ids[:crossing], previous[:crossing + 1], operations)
+
+def _backtrace_operations(r_ids, h_ids, linear_memory=False):
+    """
+    Operations of the wer backtrace, from (len(r), len(h)) back to (0, 0).
+
+    Args:
+    - r_ids (array): Reference ids.
+    - h_ids (array): Hypothesis ids.
+    - linear_memory (bool): If true use the divide-and-conquer alignment, which keeps
+      O(len(h) log len(r)) costs and a bounded block instead of the full matrix. Default is false.
+
+    Returns:
+    - list: Operations (OP_OK, OP_SUB, OP_INS, OP_DEL).
+    """
+    operations = []
+    if linear_memory:
+        j = _align_block(r_ids, h_ids, np.arange(len(h_ids) + 1), operations)
+    else:
+        j = _walk_backtrace(_edit_backtrace(r_ids, h_ids), len(h_ids), operations)
+    # Row 0: insert the remaining hypothesis words
+    operations.extend([OP_INS] * j)
+    return operations
+
+@lru_cache(maxsize=4096)
+def _wer_cached(ref, hyp):
+    return wer(ref, hyp, return_comparate=False, debug=False)
+
+def cer(ref, hyp):
+    """
+    Character error rate, with the same counts as wer over the characters of the texts.
+
+    Returns:
+    - dict: {'CER', 'Cor', 'Sub', 'Ins', 'Del'}
+    """
+    r, h = list(ref), list(hyp)
+    numSub, numDel, numIns = _edit_counts(*tokens2ids(r, h))
+    cer_result = round( (numSub + numDel + numIns) / (float) (len(r)), 3)
+    return {'CER':cer_result, 'Cor':len(r) - numSub - numDel, 'Sub':numSub, 'Ins':numIns, 'Del':numDel}
+
+def _score_pair(pair, metric):
+    ref, hyp = pair
+    if metric == "cer":
+        return cer(ref, hyp)
+    return dict(_wer_cached(ref, hyp))
+
+def wer_batch(pairs, metric:str = "wer", n_jobs:int = 1, chunksize:int = 16):
+    """
+    Score many (reference, hypothesis) pairs, optionally across a process pool.
+
+    Args:
+    - pairs (list of tuples): List of (ref, hyp) texts.
+    - metric (str): "wer" or "cer". Default is "wer".
+    - n_jobs (int): Number of worker processes. 1 scores in the current process (with the
+      per-process cache of repeated pairs), None uses all the CPUs. Default is 1.
+    - chunksize (int): Number of pairs sent to a worker at once. Default is 16.
+
+    Returns:
+    - list of dicts: Result of wer (or cer) for each pair, in input order.
+    """
+    assert metric in ["wer", "cer"], "metric not permited"
+    metrics = [metric] * len(pairs)
+    try:
+        if n_jobs == 1:
+            return list(map(_score_pair, pairs, metrics))
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            return list(executor.map(_score_pair, pairs, metrics, chunksize=chunksize))
+    except Exception as e:
+        print(e)
+        raise Exception("Error in apply wer metric")
+
 def colored(r, g, b, text):
     return "\033[38;2;{};{};{}m{} \033[38;2;255;255;255m".format(r, g, b, text)
 
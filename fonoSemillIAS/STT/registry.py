@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+from fonoSemillIAS.others import print_helpers as pp
+
+class ModelRegistry():
+    def __init__(self, debug: bool = False) -> None:
+        """
+        Process-wide cache of loaded models.
+
+        Each model is loaded once per key, for example (model id, dtype, device, decoding config),
+        and the same object is returned to every instance that asks for that key.
+        """
+        self.debug = debug
+        self._models = {}
+        self._stats = {}
+        self._locks = {}
+        self._lock = threading.RLock()
+
+    def get(self, key: tuple, loader):
+        """
+        Return the model of key, calling loader() to create it the first time.
+
+        Args:
+        - key (tuple): Hashable key of the model.
+        - loader (callable): Function without arguments that loads the model.
+
+        Returns:
+        - The object returned by loader.
+        """
+        with self._lock:
+            if key in self._models:
+                self._stats[key]["hits"] += 1
+                if self.debug: pp.printg(f"Registry hit: {key}")
+                return self._models[key]
+
+            if self.debug: pp.printy(f"Registry load: {key}")
+            rss_before = _resident_memory()
+            start = time.perf_counter()
+            model = loader()
+            load_time = time.perf_counter() - start
+            rss_after = _resident_memory()
+
+            self._models[key] = model
+            self._stats[key] = {
+                "load_time_s": load_time,
+                "parameters_bytes": _parameters_bytes(model),
+                "rss_delta_bytes": None if rss_before is None else rss_after - rss_before,
+                "hits": 0,
+            }
+            return model
+
+    def evict(self, key: tuple = None) -> bool:
+        """
+        Drop a model (or every model when key is None) from the registry.
+
+        Returns:
+        - bool: True if something was evicted.
+        """
+        with self._lock:
+            if key is None:
+                evicted = len(self._models) > 0
+                self._models.clear()
+                self._stats.clear()
+                return evicted
+            self._stats.pop(key, None)
+            return self._models.pop(key, None) is not None
+
+    def lock(self, key: tuple):
+        """
+        Lock of the model of key, for callers that change the state of the shared object
+        (for example the file list of a decoder) and must hold it until they finish using it.
+
+        Returns:
+        - threading.Lock: The same lock for every call with the same key.
+        """
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._models
+
+    def keys(self) -> list:
+        return list(self._models.keys())
+
+    def stats(self) -> dict:
+        """
+        Load time, memory and hits of each loaded model.
+
+        Returns:
+        - dict: key -> {"load_time_s", "parameters_bytes", "rss_delta_bytes", "hits"}. parameters_bytes
+          is the size of the tensors of the model, rss_delta_bytes the growth of the process
+          resident memory during the load (None where /proc is not available).
+        """
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
+
+def _parameters_bytes(model) -> int:
+    """
+    Size of the parameters and buffers of the torch modules inside model (or a tuple of objects).
+    """
+    objects = model if isinstance(model, (tuple, list)) else [model]
+    total = 0
+    for obj in objects:
+        if not hasattr(obj, "parameters"):
+            continue
+        tensors = list(obj.parameters()) + (list(obj.buffers()) if hasattr(obj, "buffers") else [])
+        total += sum(t.numel() * t.element_size() for t in tensors)
+    return total
+
+def _resident_memory():
+    """
+    Resident memory of the process in bytes, None if /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Registry shared by the STT wrappers of the process
+model_registry = ModelRegistry()
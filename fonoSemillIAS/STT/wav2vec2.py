@@ -1,8 +1,10 @@
 import librosa
+import numpy as np
 import torch
 from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
 
 from fonoSemillIAS.others import print_helpers as pp
+from fonoSemillIAS.STT.registry import model_registry
 
 class Wav2Vec2ASR():
     def __init__(self, model: str, fs:int = 16000, debug:bool = False) -> None:
@@ -17,9 +19,11 @@ class Wav2Vec2ASR():
         if self.debug:
             pp.printy("Start create Whisper Model")
         try:
-            model = Wav2Vec2ForCTC.from_pretrained(self.model_id)
+            def loader():
+                return Wav2Vec2ForCTC.from_pretrained(self.model_id), Wav2Vec2Processor.from_pretrained(self.model_id)
 
-            processor = Wav2Vec2Processor.from_pretrained(self.model_id)
+            # Shared by every Wav2Vec2ASR of the process with the same model
+            model, processor = model_registry.get(("wav2vec2", self.model_id, "float32", "cpu"), loader)
 
             if self.debug:
                 pp.printg("Complete download and create model")
@@ -45,4 +49,90 @@ class Wav2Vec2ASR():
             print("\tFinish ASR")
             print("- All transcript: ", text)
 
-        return text
\ No newline at end of file
+        return text
+
+    def apply_long(self, file_path: str, chunk_length_s: float = 20, stride_length_s: float = 4, batch_size: int = 4):
+        """
+        Long-form transcription with overlapping chunks.
+
+        The waveform is split in chunks of chunk_length_s seconds that overlap stride_length_s seconds
+        on each side. Chunks go through the model in batches, and for each chunk only the CTC frames
+        outside its strides are kept, so the stitched frames cover the recording once. Activation
+        memory is bounded by chunk length x batch size.
+
+        Args:
+        - file_path (str): Path of the audio file.
+        - chunk_length_s (float): Length of each chunk in seconds. Default is 20.
+        - stride_length_s (float): Context on each side of a chunk that is discarded after inference. Default is 4.
+        - batch_size (int): Number of chunks per forward pass. Default is 4.
+
+        Returns:
+        - text (str): Transcript.
+        - word_timestamps (list): One dict per word with "word", "start_time" and "end_time" (seconds).
+        """
+        if self.debug: pp.printc("\t Start ASR process (long-form)")
+
+        waveform, _ = librosa.load(file_path, sr=self.fs)
+
+        chunk_length = int(chunk_length_s * self.fs)
+        stride_length = int(stride_length_s * self.fs)
+        assert chunk_length > 2 * stride_length, "chunk_length_s must be greater than 2 * stride_length_s"
+        # Samples per CTC frame
+        ratio = self.model.config.inputs_to_logits_ratio
+
+        try:
+            chunks = list(self.chunk_waveform(waveform, chunk_length, stride_length))
+            predicted_ids = []
+            for first in range(0, len(chunks), batch_size):
+                batch = chunks[first:first + batch_size]
+                inputs = self.processor([chunk for chunk, _, _ in batch], sampling_rate = self.fs,
+                                        return_tensors="pt", padding=True)
+                with torch.no_grad():
+                    ids = torch.argmax(self.model(**inputs).logits, dim=-1).numpy()
+
+                # Keep the frames outside the strides of each chunk
+                for (chunk, left, right), chunk_ids in zip(batch, ids):
+                    start = int(round(left / ratio))
+                    end = int(round((len(chunk) - right) / ratio))
+                    predicted_ids.append(chunk_ids[start:end])
+        except Exception as e:
+            print(e)
+            raise Exception("Error apply ASR in long-form mode")
+
+        predicted_ids = np.concatenate(predicted_ids) if predicted_ids else np.zeros(0, dtype=int)
+        outputs = self.processor.tokenizer.decode(predicted_ids, output_word_offsets=True)
+
+        time_per_frame = ratio / self.fs
+        word_timestamps = [{"word": offset["word"],
+                            "start_time": round(offset["start_offset"] * time_per_frame, 3),
+                            "end_time": round(offset["end_offset"] * time_per_frame, 3)}
+                           for offset in outputs.word_offsets]
+
+        text = outputs.text
+        if self.debug: 
+            print("\tFinish ASR")
+            print("- All transcript: ", text)
+            print("- Num of chunks:", len(chunks))
+
+        return text, word_timestamps
+
+    @staticmethod
+    def chunk_waveform(waveform, chunk_length: int, stride_length: int):
+        """
+        Split a waveform in overlapping chunks.
+
+        Yields:
+        - tuple: (chunk, left stride, right stride) in samples. The first chunk has no left stride
+          and the last one no right stride.
+        """
+        step = chunk_length - 2 * stride_length
+        for start in range(0, len(waveform), step):
+            end = start + chunk_length
+            is_last = end >= len(waveform)
+            left = 0 if start == 0 else stride_length
+            right = 0 if is_last else stride_length
+            chunk = waveform[start:end]
+            if len(chunk) > left:
+                yield chunk, left, right
+            if is_last:
+                break
@@ -1,16 +1,28 @@
+import time
 import torch
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 
 from fonoSemillIAS.others import print_helpers as pp
+from fonoSemillIAS.STT.registry import model_registry
 
 class WhisperASR():
-    def __init__(self, model: str, debug:bool = False) -> None:
+    def __init__(self, model: str, debug:bool = False, cpu_quantization: str = None) -> None:
+        """
+        Args:
+        - model (str): Model id or local path.
+        - cpu_quantization (str): On CPU, "bf16" loads the model in bfloat16 and "int8" applies
+          dynamic int8 quantization to the Linear layers. Ignored on GPU. Default is None (float32).
+        """
+        assert cpu_quantization in [None, "bf16", "int8"], "cpu_quantization not permited"
         self.model_id = model
 
         self.debug = debug
 
         self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
         self.torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+        self.quantization = cpu_quantization if self.device == "cpu" else None
+        if self.quantization == "bf16":
+            self.torch_dtype = torch.bfloat16
 
         self.model, self.processor = self.create_model()
 
@@ -21,12 +33,20 @@ class WhisperASR():
         if self.debug:
             pp.printy("Start create Whisper Model")
         try:
-            model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            self.model_id, torch_dtype= self.torch_dtype, low_cpu_mem_usage=False, use_safetensors=True
-            )
-            model.to(self.device)
+            def loader():
+                model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                self.model_id, torch_dtype= self.torch_dtype, low_cpu_mem_usage=False, use_safetensors=True
+                )
+                model.to(self.device)
+                if self.quantization == "int8":
+                    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
 
-            processor = AutoProcessor.from_pretrained(self.model_id)
+                processor = AutoProcessor.from_pretrained(self.model_id)
+                return model, processor
+
+            # Shared by every WhisperASR of the process with the same model, dtype and device
+            key = ("whisper", self.model_id, str(self.torch_dtype), self.device, self.quantization)
+            model, processor = model_registry.get(key, loader)
 
             if self.debug:
                 pp.printg("Complete download and create model")
@@ -74,3 +94,48 @@ class WhisperASR():
                 print(f"{k.upper()}: {i}")
 
         return result
+
+    def transcribe_many(self, files: list, generate_kwargs: dict = None, **pipeline_kwargs):
+        """
+        Transcribe many files with a single pipeline.
+
+        The pipeline is created once (with create_pipeline(**pipeline_kwargs) if it does not exist)
+        and the files are streamed through it as a generator, so the HF pipeline batches the
+        30 s chunks across files.
+
+        Args:
+        - files (list): Paths of the audio files.
+        - generate_kwargs (dict): Generation arguments, as in apply. Default is None.
+        - pipeline_kwargs: Arguments of create_pipeline (max_new_tokens, chunk_length_s, batch_size,
+          return_timestamps), used only when the pipeline is created.
+
+        Returns:
+        - results (list): Pipeline result of each file, in input order.
+        - stats (list): One dict per file with "file" and "time_s", the wall time between
+          the previous result and this one.
+        """
+        if self.pipe is None:
+            self.pipe = self.create_pipeline(**pipeline_kwargs)
+        if self.debug: pp.printc(f"\t Start ASR process: {len(files)} files")
+
+        def dataset():
+            for file_path in files:
+                yield file_path
+
+        results, stats = [], []
+        try:
+            last = time.perf_counter()
+            for file_path, result in zip(files, self.pipe(dataset(), generate_kwargs= generate_kwargs or {})):
+                now = time.perf_counter()
+                results.append(result)
+                stats.append({"file": file_path, "time_s": now - last})
+                last = now
+        except Exception as e:
+            print(e)
+            raise Exception("Error apply ASR in transcribe_many")
+
+        if self.debug:
+            print("\tFinish ASR")
+            print("- Total time (s): ", sum(stat["time_s"] for stat in stats))
+
+        return results, stats
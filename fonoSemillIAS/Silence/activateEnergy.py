@@ -1,5 +1,10 @@
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 def shannon_energy(signal):
     """
     Calculates the Shannon energy of an audio signal.
@@ -10,21 +15,37 @@ def shannon_energy(signal):
     Returns:
     - energy (float): The Shannon energy of the signal.
     """
-    energy = -(signal**2) * np.log10(signal**2)
-    return np.nan_to_num(energy)
+    square = np.square(signal)
+    # log10(0) is -inf and 0 * -inf is nan: those samples have 0 energy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        energy = -square * np.log10(square)
+    return np.nan_to_num(energy, copy=False)
 
-def avr_energy(energy_sequence, window_move):
+def avr_energy(energy_sequence, window_move, hop=1, method="cumsum"):
     """
     Calculates the continuous average energy for every 50 ms along the original signal.
 
     Parameters:
     - energy_sequence (array): The energy sequence of the original signal.
-    - window_move (int): Size of the moving window in ms.
-    - overlap (float): Overlap percentage between consecutive windows.
+    - window_move (int): Size of the moving window in samples.
+    - hop (int): Distance in samples between consecutive outputs. 1 gives one value per sample,
+                 larger values give a frame-rate envelope with ceil(len / hop) values (default is 1).
+    - method (str): "cumsum" for the O(N) cumulative-sum backend or "loop" for the original
+                    per-sample loop (default is "cumsum").
 
     Returns:
     - average_energy (array): The calculated continuous average energy.
     """
+    assert method in ["cumsum", "loop"], "method not permited"
+    assert hop >= 1, "hop must be a positive integer"
+    if method == "loop":
+        return _avr_energy_loop(energy_sequence, window_move, hop)
+    return _avr_energy_cumsum(energy_sequence, window_move, hop)
+
+def _avr_energy_loop(energy_sequence, window_move, hop=1):
+    """
+    Reference implementation of avr_energy: averages a window slice for every output sample.
+    """
     # Calculate the number of samples that overlap between consecutive windows
     window_move = window_move // 2
     # Initialize the index to start the window
@@ -37,9 +58,40 @@ def avr_energy(energy_sequence, window_move):
         # Calculate the average energy over the window
         average_energy.append(np.mean(window_energy))
         # Move the window with the overlap
-        start_index += 1
+        start_index += hop
     return np.nan_to_num(np.array(average_energy))
 
+def _avr_energy_cumsum(energy_sequence, window_move, hop=1):
+    """
+    Cumulative-sum implementation of avr_energy.
+
+    Reproduces the slice energy_sequence[i - w : i + w] of the loop, including the Python
+    slicing rules when i - w is negative (the start wraps to the end of the array, so the
+    window is usually empty and its average is 0).
+    """
+    energy_sequence = np.asarray(energy_sequence, dtype=np.float64)
+    n = len(energy_sequence)
+    window_move = window_move // 2
+
+    # Prefix sums: the sum of energy[a:b] is cumulative[b] - cumulative[a]
+    cumulative = np.zeros(n + 1)
+    np.cumsum(energy_sequence, out=cumulative[1:])
+
+    average_energy = np.zeros(len(range(0, n, hop)))
+    # Evaluate the outputs in blocks so the index temporaries stay small
+    block = 1 << 20
+    for first in range(0, len(average_energy), block):
+        index = np.arange(first, min(first + block, len(average_energy))) * hop
+        start = index - window_move
+        start = np.where(start < 0, np.maximum(start + n, 0), start)
+        end = np.minimum(index + window_move, n)
+
+        count = end - start
+        valid = count > 0
+        out = average_energy[first:first + len(index)]
+        out[valid] = (cumulative[end[valid]] - cumulative[start[valid]]) / count[valid]
+    return np.nan_to_num(average_energy, copy=False)
+
 def envelogram(average_energy_sequence):
     """
     Calculates the normalized envelogram.
@@ -78,14 +130,12 @@ def identify_lobes(envelogram, zero_crossings):
     Returns:
     - lobe_indices (list of tuples): Indices of the lobes.
     """
-    lobe_indices = []
-    start_idx = 0
-    for zero_crossing in zero_crossings:
-        lobe_indices.append((start_idx, zero_crossing))
-        start_idx = zero_crossing
-    # Add the last lobe
-    lobe_indices.append((start_idx, len(envelogram) - 1))
-    return lobe_indices
+    zero_crossings = np.asarray(zero_crossings, dtype=np.int64)
+    # Each lobe goes from the previous zero crossing (0 for the first) to the next one,
+    # and the last lobe ends at the last sample
+    starts = np.concatenate([[0], zero_crossings])
+    ends = np.concatenate([zero_crossings, [len(envelogram) - 1]])
+    return list(zip(starts.tolist(), ends.tolist()))
 
 def identify_silence(envelogram, lobe_indices):
     """
@@ -99,11 +149,412 @@ def identify_silence(envelogram, lobe_indices):
     - intervals (list of tuples): List of tuples (i, j) where the mean value of the lobe is negative.
     - pulse (array): Array marking the regions of silence with 1.
     """
-    intervals = []
+    if len(lobe_indices) == 0:
+        return []
+    starts, ends = np.asarray(lobe_indices, dtype=np.int64).T
+    # Sum of every lobe from the prefix sums; the empty lobes (mean nan) are not silences
+    cumulative = np.zeros(len(envelogram) + 1)
+    np.cumsum(envelogram, out=cumulative[1:])
+    silence = (ends > starts) & (cumulative[ends] - cumulative[starts] < 0)
+    return list(zip(starts[silence].tolist(), ends[silence].tolist()))
+
+def detect_silences(signal, window_move, backend="auto"):
+    """
+    Silence intervals of a normalized signal: Shannon energy, average energy, envelogram,
+    zero crossings, lobes and negative lobes in one call.
+
+    The numba backend is a compiled kernel that goes from the signal to the intervals in a
+    few sequential passes, keeping only the prefix sums of the energy in memory, with no
+    per-lobe Python work. The numpy backend chains the functions of this module.
+
+    Parameters:
+    - signal (array): The normalized audio signal.
+    - window_move (int): Size of the moving window in samples.
+    - backend (str): "numba", "numpy" or "auto" (numba when it is installed) (default is "auto").
+
+    Returns:
+    - intervals (list of tuples): (start, end) sample indices of the silences, as identify_silence.
+    """
+    assert backend in ["auto", "numba", "numpy"], "backend not permited"
+    if backend == "auto":
+        backend = "numpy" if njit is None else "numba"
+    if backend == "numpy":
+        average_energy = avr_energy(energy_sequence = shannon_energy(signal), window_move = window_move)
+        envelogram_wave = envelogram(average_energy_sequence = average_energy)
+        lobe_indices = identify_lobes(envelogram = envelogram_wave,
+                                      zero_crossings = find_zero_crossings(envelogram = envelogram_wave))
+        return identify_silence(envelogram = envelogram_wave, lobe_indices = lobe_indices)
+
+    assert njit is not None, "numba is not installed"
+    starts, ends = _silence_kernel()(np.ascontiguousarray(signal, dtype=np.float64), window_move // 2)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def detect_silences_multires(signal, window_move, hop, refine=True):
+    """
+    Frame-rate version of detect_silences with sample-precision boundaries.
+
+    The average energy is evaluated only every `hop` samples, and the envelogram and its zero
+    crossings are computed on that frame-rate envelope, so their cost drops by the hop factor. Each
+    hop [k * hop, (k + 1) * hop] where the frame envelogram changes sign is then evaluated at the
+    sample rate, from the prefix sums of the energy, and all its zero crossings are kept. The lobes
+    between those crossings are classified with the sum of the sample-rate envelogram, from the
+    prefix sums of the prefix sums. With hop = 1 the intervals are those of detect_silences. With a
+    larger hop the envelogram is normalized with the mean and standard deviation of the frames, so
+    the boundaries move slightly, and pairs of crossings inside one hop (lobes shorter than a hop)
+    are missed.
+
+    Parameters:
+    - signal (array): The normalized audio signal.
+    - window_move (int): Size of the moving window in samples.
+    - hop (int): Distance in samples between the frames of the envelope.
+    - refine (bool): Refine the boundaries to the sample. If false the lobes of the frame envelogram
+                     are returned with boundaries k * hop (default is True).
+
+    Returns:
+    - intervals (list of tuples): (start, end) sample indices of the silences, as identify_silence.
+    """
+    assert hop >= 1, "hop must be a positive integer"
+    energy_sequence = shannon_energy(signal)
+    n = len(energy_sequence)
+    if n == 0:
+        return []
+    half = window_move // 2
+    cumulative = np.zeros(n + 1)
+    np.cumsum(energy_sequence, out=cumulative[1:])
+    del energy_sequence
+
+    # Detection on the frame-rate envelope
+    coarse = _window_average(cumulative, np.arange(0, n, hop), half)
+    mean, standard_deviation = np.mean(coarse), np.std(coarse)
+    envelogram_frames = (coarse - mean) / standard_deviation
+    frame_crossings = find_zero_crossings(envelogram = envelogram_frames)
+    if not refine:
+        intervals = identify_silence(envelogram = envelogram_frames,
+                                     lobe_indices = identify_lobes(envelogram = envelogram_frames,
+                                                                   zero_crossings = frame_crossings))
+        if len(intervals) == 0:
+            return []
+        frame_start, frame_end = np.asarray(intervals, dtype=np.int64).T
+        # The last lobe ends at the last sample, as in the sample-rate detector
+        end = np.where(frame_end == len(envelogram_frames) - 1, n - 1, frame_end * hop)
+        return list(zip((frame_start * hop).tolist(), end.tolist()))
+
+    # Every sample-rate crossing of the hops that bracket a frame crossing
+    crossings = _bracket_crossings(cumulative, frame_crossings * hop, hop, half, mean)
+    starts = np.concatenate([[0], crossings])
+    ends = np.concatenate([crossings, [n - 1]])
+    # Sum of the envelogram over each lobe, without its last sample (as identify_silence)
+    prefix_starts, prefix_ends = _average_prefix(cumulative, np.stack([starts, ends]), half)
+    lobe_sums = (prefix_ends - prefix_starts - (ends - starts) * mean) / standard_deviation
+    silence = (ends > starts) & (lobe_sums < 0)
+    return list(zip(starts[silence].tolist(), ends[silence].tolist()))
+
+def _window_average(cumulative, index, half):
+    """
+    avr_energy at the given indices from the prefix sums of the energy (same windows as avr_energy).
+    """
+    n = len(cumulative) - 1
+    start = index - half
+    start = np.where(start < 0, np.maximum(start + n, 0), start)
+    end = np.minimum(index + half, n)
+    count = end - start
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(count > 0, (cumulative[end] - cumulative[np.minimum(start, n)]) / count, 0.)
+
+def _bracket_crossings(cumulative, first_samples, hop, half, mean):
+    """
+    Sorted samples z of the ranges [first, first + hop) where the sign of the sample-rate envelogram
+    changes between z and z + 1 (the sign of average - mean, as the standard deviation is positive).
+    """
+    if len(first_samples) == 0:
+        return np.zeros(0, dtype=np.int64)
+    n = len(cumulative) - 1
+    index = np.minimum(first_samples[:, None] + np.arange(hop + 1), n - 1)
+    sign = np.sign(_window_average(cumulative, index, half) - mean)
+    changes = (sign[:, :-1] != sign[:, 1:]) & (index[:, 1:] > index[:, :-1])
+    # The ranges are sorted and disjoint, so the crossings come out sorted
+    return index[:, :-1][changes]
+
+def _average_prefix(cumulative, k, half):
+    """
+    Sum of avr_energy over the samples [0, k), for an array of k, from the prefix sums of the energy.
+
+    Between half and n - half the windows are complete and the sum is a difference of the prefix
+    sums of the prefix sums; the first and last half windows are evaluated one by one.
+    """
+    n = len(cumulative) - 1
+    if half == 0 or n < 2 * half + 1:
+        averages = _window_average(cumulative, np.arange(n), half)
+        return np.concatenate([[0.], np.cumsum(averages)])[k]
+    # head: samples [0, half), interior: [half, n - half], tail: (n - half, n)
+    head = np.concatenate([[0.], np.cumsum(_window_average(cumulative, np.arange(half), half))])
+    tail_first = n - half + 1
+    tail = np.concatenate([[0.], np.cumsum(_window_average(cumulative, np.arange(tail_first, n), half))])
+    double = np.zeros(n + 2)
+    np.cumsum(cumulative, out=double[1:])
+
+    interior_end = np.clip(k, half, tail_first)
+    interior = (double[interior_end + half] - double[2 * half]
+                - double[interior_end - half] + double[0]) / (2 * half)
+    return head[np.clip(k, 0, half)] + interior + tail[np.clip(k, tail_first, n) - tail_first]
+
+_SILENCE_KERNEL = []
+
+def _silence_kernel():
+    """
+    Compiled kernel of detect_silences (compiled on the first call and cached on disk).
+    """
+    if _SILENCE_KERNEL:
+        return _SILENCE_KERNEL[0]
+
+    @njit(cache=True, inline="always", error_model="numpy")
+    def average(cumulative, n, i, half):
+        # Same window as avr_energy: energy[i - half : i + half] with the Python slicing rules
+        start = i - half
+        if start < 0:
+            start = max(start + n, 0)
+        end = min(i + half, n)
+        if end <= start:
+            return 0.0
+        return (cumulative[end] - cumulative[start]) / (end - start)
+
+    @njit(cache=True)
+    def grow(array):
+        larger = np.empty(2 * len(array), dtype=array.dtype)
+        larger[:len(array)] = array
+        return larger
+
+    @njit(cache=True, error_model="numpy")
+    def kernel(signal, half):
+        n = len(signal)
+        # Pass 1: prefix sums of the Shannon energy
+        cumulative = np.zeros(n + 1)
+        for i in range(n):
+            square = signal[i] * signal[i]
+            energy = -square * np.log10(square) if square > 0 else 0.0
+            if not np.isfinite(energy):
+                energy = 0.0
+            cumulative[i + 1] = cumulative[i] + energy
+
+        # Pass 2 and 3: mean and standard deviation of the average energy
+        total = 0.0
+        for i in range(n):
+            total += average(cumulative, n, i, half)
+        mean = total / n
+        total = 0.0
+        for i in range(n):
+            deviation = average(cumulative, n, i, half) - mean
+            total += deviation * deviation
+        standard_deviation = np.sqrt(total / n)
+
+        # Pass 4: envelogram, zero crossings and lobes
+        starts = np.empty(1024, dtype=np.int64)
+        ends = np.empty(1024, dtype=np.int64)
+        n_silences = 0
+        lobe_start = 0
+        lobe_sum = 0.0
+        current = (average(cumulative, n, 0, half) - mean) / standard_deviation
+        for i in range(n - 1):
+            following = (average(cumulative, n, i + 1, half) - mean) / standard_deviation
+            if np.sign(current) != np.sign(following):
+                if i > lobe_start and lobe_sum < 0:
+                    if n_silences == len(starts):
+                        starts, ends = grow(starts), grow(ends)
+                    starts[n_silences] = lobe_start
+                    ends[n_silences] = i
+                    n_silences += 1
+                lobe_start = i
+                lobe_sum = 0.0
+            lobe_sum += current
+            current = following
+        # Last lobe, up to the last sample (excluded)
+        if n > 0 and n - 1 > lobe_start and lobe_sum < 0:
+            if n_silences == len(starts):
+                starts, ends = grow(starts), grow(ends)
+            starts[n_silences] = lobe_start
+            ends[n_silences] = n - 1
+            n_silences += 1
+        return starts[:n_silences], ends[:n_silences]
+
+    _SILENCE_KERNEL.append(kernel)
+    return kernel
+
+def stream_avr_energy(energy_blocks, window_move):
+    """
+    Streaming version of avr_energy for a sequence of energy blocks.
+
+    Keeps the last `window_move` samples between blocks, so the memory used is
+    proportional to the block size and not to the length of the signal. The
+    concatenation of the yielded blocks equals avr_energy over the whole sequence.
+
+    Parameters:
+    - energy_blocks (iterable of arrays): Consecutive blocks of the energy sequence.
+    - window_move (int): Size of the moving window in samples.
+
+    Yields:
+    - average_energy (array): Consecutive blocks of the continuous average energy. Blocks are
+                              delayed by half a window with respect to the input blocks.
+    """
+    window_half = window_move // 2
+    if window_half == 0:
+        # Empty windows: every average is 0
+        for block in energy_blocks:
+            yield np.zeros(len(block))
+        return
+
+    buffer = np.zeros(0)
+    buffer_start = 0  # Global index of buffer[0]
+    next_out = 0      # Global index of the next average to yield
+    n_seen = 0
+
+    for block in energy_blocks:
+        block = np.asarray(block, dtype=np.float64)
+        n_seen += len(block)
+        buffer = np.concatenate([buffer, block])
+
+        # The windows that start before 0 are only empty once the signal is at least one window long
+        if n_seen < 2 * window_half:
+            continue
+
+        # Averages whose window is complete
+        last = n_seen - window_half
+        index = np.arange(next_out, last + 1)
+        if len(index) == 0:
+            continue
+        average_energy = np.zeros(len(index))
+        full = index >= window_half
+        cumulative = np.zeros(len(buffer) + 1)
+        np.cumsum(buffer, out=cumulative[1:])
+        local = index[full] - buffer_start
+        average_energy[full] = (cumulative[local + window_half] - cumulative[local - window_half]) / (2 * window_half)
+        yield average_energy
+
+        next_out = last + 1
+        drop = max(next_out - window_half, 0) - buffer_start
+        buffer, buffer_start = buffer[drop:], buffer_start + drop
+
+    if n_seen == 0 or next_out == n_seen:
+        return
+    if n_seen < 2 * window_half:
+        # Signal shorter than the window: the buffer still holds the whole sequence
+        yield avr_energy(buffer, 2 * window_half)
+        return
+
+    # Last windows are truncated at the end of the signal
+    index = np.arange(next_out, n_seen)
+    cumulative = np.zeros(len(buffer) + 1)
+    np.cumsum(buffer, out=cumulative[1:])
+    local = index - buffer_start
+    yield (cumulative[-1] - cumulative[local - window_half]) / (n_seen - index + window_half)
+
+def running_stats(blocks):
+    """
+    Computes the mean and the standard deviation of a sequence of blocks in one pass.
+
+    Parameters:
+    - blocks (iterable of arrays): Consecutive blocks of the sequence.
+
+    Returns:
+    - mean (float): Mean of the whole sequence.
+    - standard_deviation (float): Population standard deviation of the whole sequence.
+    """
+    count, mean, m2 = 0, 0.0, 0.0
+    for block in blocks:
+        count, mean, m2 = _merge_stats(count, mean, m2, block)
+    if count == 0:
+        return np.nan, np.nan
+    return mean, np.sqrt(m2 / count)
+
+def _merge_stats(count, mean, m2, block):
+    """
+    Merges the statistics of a block into the running (count, mean, M2) triplet (Chan et al.).
+    """
+    n = len(block)
+    if n == 0:
+        return count, mean, m2
+    block_mean = np.mean(block)
+    block_m2 = np.sum((block - block_mean) ** 2)
+    total = count + n
+    delta = block_mean - mean
+    mean = mean + delta * n / total
+    m2 = m2 + block_m2 + delta ** 2 * count * n / total
+    return total, mean, m2
+
+def stream_envelogram(average_energy_blocks, mean=None, standard_deviation=None):
+    """
+    Streaming version of envelogram.
+
+    Parameters:
+    - average_energy_blocks (iterable of arrays): Consecutive blocks of the continuous average energy.
+    - mean (float): Mean of the whole average energy sequence. If None, each block is normalized
+                    with the running statistics of the blocks seen so far (default is None).
+    - standard_deviation (float): Standard deviation of the whole average energy sequence (default is None).
+
+    Yields:
+    - envelogram (array): Consecutive blocks of the normalized envelogram.
+    """
+    if mean is not None:
+        for block in average_energy_blocks:
+            yield (block - mean) / standard_deviation
+        return
+
+    count, running_mean, m2 = 0, 0.0, 0.0
+    for block in average_energy_blocks:
+        count, running_mean, m2 = _merge_stats(count, running_mean, m2, block)
+        running_std = np.sqrt(m2 / count) if count else 0.0
+        yield (block - running_mean) / (running_std if running_std > 0 else 1.0)
+
+def stream_silence_intervals(envelogram_blocks):
+    """
+    Streaming version of find_zero_crossings, identify_lobes and identify_silence.
+
+    Only the running sum of the current lobe is kept between blocks. Each silence interval
+    is yielded as soon as the zero crossing that closes it is found.
+
+    Parameters:
+    - envelogram_blocks (iterable of arrays): Consecutive blocks of the envelogram.
+
+    Yields:
+    - interval (tuple): (i, j) indices of a lobe whose mean value is negative.
+    """
+    lobe_start = 0
+    lobe_sum = 0.0      # Sum of the envelogram from lobe_start to the start of the block
+    previous = None     # Last envelogram value of the previous block
+    block_start = 0
+
+    for block in envelogram_blocks:
+        block = np.asarray(block, dtype=np.float64)
+        if len(block) == 0:
+            continue
+
+        # Crossings between the previous block and this one are indexed from the last sample of the previous block
+        if previous is None:
+            extended = block
+            offset = block_start
+            head = lobe_sum
+        else:
+            extended = np.concatenate([[previous], block])
+            offset = block_start - 1
+            head = lobe_sum - previous
+        # partial[x] = sum of the envelogram from lobe_start to global index offset + x
+        partial = np.empty(len(extended) + 1)
+        partial[0] = head
+        np.cumsum(extended, out=partial[1:])
+        partial[1:] += head
+
+        crossings = np.where(np.diff(np.sign(extended)))[0]
+        lobe_sums = np.diff(np.concatenate([[0.0], partial[crossings]]))
+        for crossing, total in zip(crossings + offset, lobe_sums):
+            if crossing > lobe_start and total < 0:
+                yield (lobe_start, crossing)
+            lobe_start = crossing
 
-    for start_index, final_index in lobe_indices:
-        arr = envelogram[start_index:final_index]
-        if np.mean(arr) < 0:
-            intervals.append((start_index, final_index))
+        lobe_sum = partial[-1] - (partial[crossings[-1]] if len(crossings) else 0.0)
+        previous = block[-1]
+        block_start += len(block)
 
-    return intervals
\ No newline at end of file
+    # Add the last lobe, which ends at the last sample (excluded from its mean)
+    if previous is not None:
+        total = lobe_sum - previous
+        if block_start - 1 > lobe_start and total < 0:
+            yield (lobe_start, block_start - 1)
@@ -1,12 +1,39 @@
+import numpy as np
 import torch
 torch.set_num_threads(1)
 from pathlib import Path
+from scipy.signal import firwin, resample_poly, upfirdn
+try:
+    import torchaudio
+except ImportError:
+    torchaudio = None
 
 class SileroVAD():
-    def __init__(self, model:str = "silero_vad", fs:int = 1600) -> None:
-        self.model, utils = torch.hub.load(repo_or_dir='snakers4/silero-vad',
-                              model= model,
-                              force_reload=True)
+    def __init__(self, model:str = "silero_vad", fs:int = 16000, repo_dir:str = None,
+                 model_path:str = None, onnx:bool = False) -> None:
+        """
+        Silero voice activity detector.
+
+        Args:
+        - model (str): Name of the model in the silero-vad repository.
+        - fs (int): Sampling rate used by the model, 8000 or 16000 Hz.
+        - repo_dir (str): Local copy of the silero-vad repository (e.g. the torch hub cache). If None,
+          the torch hub cache is used and the repository is only downloaded when it is not cached.
+        - model_path (str): Local TorchScript (.jit/.pt) file that replaces the model of the repository.
+        - onnx (bool): Load the ONNX version of the model (needs onnxruntime).
+        """
+        assert fs in [8000, 16000], "Silero VAD only supports fs = 8000 or 16000 Hz"
+
+        if repo_dir is not None:
+            self.model, utils = torch.hub.load(repo_or_dir=repo_dir, model=model, source='local', onnx=onnx)
+        else:
+            self.model, utils = torch.hub.load(repo_or_dir='snakers4/silero-vad',
+                                  model= model,
+                                  force_reload=False,
+                                  onnx=onnx)
+        if model_path is not None:
+            self.model = torch.jit.load(str(Path(model_path)))
+            self.model.eval()
         self.fs = fs
 
         self.get_speech_timestamps = utils[0]
@@ -17,3 +44,245 @@ class SileroVAD():
         speech_timestamps =  self.get_speech_timestamps(wav_torch, self.model, sampling_rate = self.fs)
         return speech_timestamps
 
+    def apply_array(self, waveform, fs:int, **kwargs):
+        """
+        Apply the VAD to an in-memory waveform.
+
+        Args:
+        - waveform (array): Mono signal in the scale of read_audio (PCM / full scale, e.g. Audio.get_pcm).
+        - fs (int): Sampling rate of the waveform. It is resampled once to the rate of the model.
+        - kwargs: Parameters of get_speech_timestamps, for example threshold or min_silence_duration_ms.
+
+        Returns:
+        - speech_timestamps (list): As in apply, in samples at the rate of the model.
+        """
+        wav_torch = torch.from_numpy(self.resample(waveform, fs).astype(np.float32))
+        speech_timestamps =  self.get_speech_timestamps(wav_torch, self.model, sampling_rate = self.fs, **kwargs)
+        return speech_timestamps
+
+    def resample(self, waveform, fs:int):
+        """
+        Resample a waveform to the rate of the model. With torchaudio installed it uses the same
+        resampler as read_audio, so apply_array and apply give the same input to the model; otherwise
+        a polyphase filter.
+        """
+        waveform = np.asarray(waveform)
+        if fs == self.fs:
+            return waveform
+        if torchaudio is not None:
+            transform = torchaudio.transforms.Resample(orig_freq=int(fs), new_freq=int(self.fs))
+            return transform(torch.from_numpy(waveform.astype(np.float32))).numpy()
+        g = np.gcd(int(fs), int(self.fs))
+        return resample_poly(waveform, int(self.fs) // g, int(fs) // g)
+
+
+class StreamResampler():
+    def __init__(self, fs_in: int, fs_out: int) -> None:
+        """
+        Polyphase resampler of a stream of blocks of any size.
+
+        It uses the filter of resample_poly and keeps the input samples that the next outputs still
+        need, so the concatenated outputs (with flush at the end of the stream) equal resample_poly
+        on the whole signal: no artifacts at the seams and ceil(n * fs_out / fs_in) samples in total.
+
+        Args:
+        - fs_in (int): Sampling rate of the blocks.
+        - fs_out (int): Sampling rate of the output.
+        """
+        g = np.gcd(int(fs_in), int(fs_out))
+        self.up, self.down = int(fs_out) // g, int(fs_in) // g
+        self.h, self.n_pre_remove = np.ones(1), 0
+        if self.up != self.down:
+            max_rate = max(self.up, self.down)
+            half_len = 10 * max_rate
+            # Zero padding of resample_poly: the output samples are at the center of the filter
+            n_pre_pad = self.down - half_len % self.down
+            self.h = np.concatenate([np.zeros(n_pre_pad),
+                                     firwin(2 * half_len + 1, 1. / max_rate, window=('kaiser', 5.0)) * self.up])
+            self.n_pre_remove = (half_len + n_pre_pad) // self.down
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new stream.
+        """
+        self.buffer = np.zeros(0)
+        # Position of buffer[0] in the input (a multiple of down) and next output of the filter
+        self.first = 0
+        self.next = 0
+        self.n_in = 0
+
+    def __call__(self, block):
+        """
+        Resample the next block of the stream.
+
+        Returns:
+        - array: The output samples that only depend on the input received so far.
+        """
+        block = np.asarray(block)
+        self.n_in += len(block)
+        if self.up == self.down:
+            return block
+        self.buffer = np.concatenate([self.buffer, block])
+        return self._emit((self.n_in * self.up - 1) // self.down + 1)
+
+    def flush(self):
+        """
+        End of the stream: the last output samples, with the input padded with zeros as resample_poly does.
+        """
+        if self.up == self.down:
+            return np.zeros(0)
+        n_out = -(-self.n_in * self.up // self.down)
+        self.buffer = np.concatenate([self.buffer, np.zeros(len(self.h) // self.up + 1)])
+        return self._emit(self.n_pre_remove + n_out)
+
+    def _emit(self, stop):
+        """
+        Outputs [next, stop) of the filter over the whole input (the first n_pre_remove are dropped).
+        """
+        start = max(self.next, self.n_pre_remove)
+        offset = self.first * self.up // self.down
+        output = np.zeros(0)
+        if stop > start:
+            output = upfirdn(self.h, self.buffer, self.up, self.down)[start - offset:stop - offset]
+        self.next = max(self.next, stop)
+        # Drop the input samples before the support of the next output, keeping first a multiple of down
+        keep = max(0, (self.next * self.down - len(self.h) + 1) // self.up)
+        keep -= keep % self.down
+        if keep > self.first:
+            self.buffer = self.buffer[keep - self.first:]
+            self.first = keep
+        return output
+
+
+class VADStream():
+    def __init__(self, vad: SileroVAD, threshold: float = 0.5, min_speech_duration_ms: int = 250,
+                 min_silence_duration_ms: int = 100, speech_pad_ms: int = 30) -> None:
+        """
+        Stateful frame-by-frame speech detector on top of a SileroVAD model.
+
+        The model keeps its recurrent state between windows (512 samples at 16 kHz, 256 at 8 kHz),
+        so long or live recordings are processed with constant memory. The segments are those of
+        get_speech_timestamps (apply_array) with the same parameters: speech starts when the
+        probability reaches threshold and ends when it stays below threshold - 0.15 for
+        min_silence_duration_ms (hysteresis), segments not longer than min_speech_duration_ms are
+        dropped and close segments share the padding between them. A segment is reported when the
+        next one is found (or at the end of the stream), as its padding depends on it.
+
+        Args:
+        - vad (SileroVAD): Loaded detector.
+        - threshold (float): Speech probability that opens a speech segment.
+        - min_speech_duration_ms (int): Segments of this duration or shorter are dropped.
+        - min_silence_duration_ms (int): Silence needed to close a speech segment.
+        - speech_pad_ms (int): Padding added to each side of the speech segments.
+        """
+        self.vad = vad
+        self.fs = vad.fs
+        self.window = 512 if vad.fs == 16000 else 256
+        self.threshold = threshold
+        self.neg_threshold = max(threshold - 0.15, 0.01)
+        self.min_speech_samples = vad.fs * min_speech_duration_ms / 1000
+        self.min_silence_samples = vad.fs * min_silence_duration_ms / 1000
+        self.speech_pad_samples = vad.fs * speech_pad_ms / 1000
+        self.reset()
+
+    def reset(self):
+        """
+        Reset the recurrent state of the model and the position in the stream.
+        """
+        self.vad.model.reset_states()
+        self.triggered = False
+        self.temp_end = 0
+        self.speech_start = 0
+        # Unpadded end of the last segment kept, whose end event waits for the next segment
+        self.last_end = None
+        self.current_sample = 0
+        self.buffer = np.zeros(0, dtype=np.float32)
+
+    def process(self, chunk):
+        """
+        Process one window of the stream.
+
+        Args:
+        - chunk (array): self.window samples at self.fs.
+
+        Returns:
+        - events (list): {"start": sample} and {"end": sample} events (samples at self.fs) found with this window.
+        """
+        current = self.current_sample
+        self.current_sample += len(chunk)
+        speech_prob = self.vad.model(torch.from_numpy(np.asarray(chunk, dtype=np.float32)), self.fs).item()
+
+        if speech_prob >= self.threshold and self.temp_end:
+            self.temp_end = 0
+
+        if speech_prob >= self.threshold and not self.triggered:
+            self.triggered = True
+            self.speech_start = current
+            return []
+
+        if speech_prob < self.neg_threshold and self.triggered:
+            if not self.temp_end:
+                self.temp_end = current
+            if current - self.temp_end < self.min_silence_samples:
+                return []
+            end, self.temp_end = self.temp_end, 0
+            self.triggered = False
+            return self._segment(self.speech_start, end)
+
+        return []
+
+    def flush(self, n_samples):
+        """
+        End of the stream: close the open segment at n_samples and report the end of the last one.
+        """
+        events = []
+        if self.triggered:
+            self.triggered = False
+            events = self._segment(self.speech_start, n_samples)
+        if self.last_end is not None:
+            events.append({"end": int(min(n_samples, self.last_end + self.speech_pad_samples))})
+            self.last_end = None
+        return events
+
+    def _segment(self, start, end):
+        """
+        Events of a finished segment: the padded end of the previous one and its padded start.
+        """
+        if end - start <= self.min_speech_samples:
+            return []
+        if self.last_end is None:
+            events = [{"start": int(max(0, start - self.speech_pad_samples))}]
+        else:
+            silence = start - self.last_end
+            # A short silence is split between the two segments
+            pad = silence // 2 if silence < 2 * self.speech_pad_samples else self.speech_pad_samples
+            events = [{"end": int(self.last_end + pad)}, {"start": int(max(0, start - pad))}]
+        self.last_end = end
+        return events
+
+    def __call__(self, blocks):
+        """
+        Process a stream of blocks of any size.
+
+        Args:
+        - blocks (iterable of arrays): Consecutive blocks of the signal at self.fs.
+
+        Yields:
+        - event (dict): {"start": sample} or {"end": sample}, alternating. An open speech segment is
+          closed at the last sample of the stream.
+        """
+        n_samples = 0
+        for block in blocks:
+            n_samples += len(block)
+            self.buffer = np.concatenate([self.buffer, np.asarray(block, dtype=np.float32)])
+            n_windows = len(self.buffer) // self.window
+            for k in range(n_windows):
+                yield from self.process(self.buffer[k * self.window:(k + 1) * self.window])
+            self.buffer = self.buffer[n_windows * self.window:]
+
+        # Last partial window, padded with zeros
+        if len(self.buffer):
+            yield from self.process(np.pad(self.buffer, (0, self.window - len(self.buffer))))
+            self.buffer = self.buffer[:0]
+        yield from self.flush(n_samples)
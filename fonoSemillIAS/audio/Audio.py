@@ -4,21 +4,31 @@ import matplotlib.pyplot as plt
 from scipy.io import wavfile
 
 from fonoSemillIAS.audio.helpers import plot_sound, play_sound
+from fonoSemillIAS.audio.features import FeatureStore
 
 class Audio():
-  def __init__(self, file_path:str, debug: bool = False):
+  def __init__(self, file_path:str, debug: bool = False, lazy: bool = False):
     """
     Class constructor
     ---------------------------------------
     Arg:
       - file_path (str): string with the address where the audio is located.
+      - lazy (bool): If true the PCM data is memory-mapped and the mono mixdown, normalization and time
+        are computed per block on demand. Default is false.
     Attributes:
       - path (str): string with the address where the audio is located.
       - name (str): string with the name of the audio (last element the path address)
-      - amplitudes (array): array with the information of the signal
+      - amplitudes (array): array with the information of the signal. In lazy mode it is built on each access.
       - fs (float): sampling frequency of the signal.
+      - n_samples (int): number of samples of the signal.
     Methods:
       - open: internal operation to load the audio
+      - open_mmap: internal operation to memory-map the audio (lazy mode)
+      - get_block: Normalized mono samples of a slice of the signal
+      - get_time: Time of a slice of the signal
+      - iter_blocks: Iterate the normalized mono signal block by block
+      - get_pcm: Mono signal in the scale of the PCM format, before the normalization
+      - features: Lazy cache of the frame features of the signal (FeatureStore)
       - get_info: Displays basic information of the loaded audio
       - plot_wave: Display the signal
       - play_sound: Play the audio
@@ -26,13 +36,30 @@ class Audio():
 
     self.path = file_path
     self.name = file_path.split("/")[-1]
-    self.fs, self.amplitude, self.channels, self.duration = self.open()
-    self.time = np.arange(0, len(self.amplitude), 1) / self.fs
+    self.lazy = lazy
     self.signal = None
     self.debug = debug
+    self._features = None
+
+    if lazy:
+      self.fs, self.data, self.channels, self.duration = self.open_mmap()
+      self.n_samples = len(self.data)
+      self._peak = None
+    else:
+      self.fs, self.amplitude, self.channels, self.duration = self.open()
+      self.n_samples = len(self.amplitude)
+      self.time = np.arange(0, len(self.amplitude), 1) / self.fs
 
     if debug: print(f"Audio {self.name} loaded correctly") 
 
+  def __getattr__(self, name):
+    # Only called when the attribute does not exist: full arrays of the lazy mode
+    if name in ["amplitude", "time"] and self.__dict__.get("lazy", False):
+      if name == "amplitude":
+        return self.get_block(0, self.n_samples)
+      return self.get_time(0, self.n_samples)
+    raise AttributeError(f"'Audio' object has no attribute '{name}'")
+
   def open(self):
     """
     Open the audio
@@ -50,6 +77,7 @@ class Audio():
     # Review num of channels
     channels = len(np.shape(amplitude))
     assert channels <= 2, "Has more than two channels"
+    full_scale = _full_scale(amplitude.dtype)
     if channels == 2:
       # Average amplitude
       ## Review length of channels
@@ -57,9 +85,117 @@ class Audio():
       amplitude = np.mean(amplitude, axis=1, dtype=int)
 
     duration = len(amplitude) / fs
+    # Factor back to the scale of the PCM format (get_pcm)
+    self._pcm_scale = max(amplitude) / full_scale
     amplitude = amplitude / max(amplitude)
     return fs, amplitude, channels, duration
 
+  def open_mmap(self):
+    """
+    Memory-map the audio without reading the samples
+    """
+    # Review the extention
+    assert self.path.endswith(".wav"), "Not a valid extension"
+
+    # Map the audio
+    try:
+      fs, data = wavfile.read(self.path, mmap=True)
+    except Exception as e:
+      print(e)
+      raise Exception("Failed to load audio")
+
+    # Review num of channels
+    channels = len(np.shape(data))
+    assert channels <= 2, "Has more than two channels"
+
+    duration = len(data) / fs
+    return fs, data, channels, duration
+
+  @property
+  def peak(self):
+    """
+    Normalization factor still to apply to the stored samples: maximum of the mono mixdown
+    in lazy mode, 1 in eager mode (amplitude is already normalized).
+    """
+    if not self.lazy:
+      return 1.0
+    if self._peak is None:
+      # One sweep over the mapped data, block by block
+      block_size = 10 * self.fs
+      self._peak = max(np.max(self._mixdown(start, min(start + block_size, self.n_samples)))
+                       for start in range(0, self.n_samples, block_size))
+    return self._peak
+
+  def _mixdown(self, start:int, stop:int):
+    """
+    Mono samples of the mapped data in [start, stop), before normalization.
+    """
+    block = self.data[start:stop]
+    if self.channels == 2:
+      block = np.mean(block, axis=1, dtype=int)
+    return block
+
+  def get_block(self, start:int, stop:int):
+    """
+    Normalized mono samples of the signal in [start, stop)
+    ---------------------------------------
+    Args:
+      - start (int): first sample of the block.
+      - stop (int): sample after the last sample of the block.
+    Returns:
+      - block (array): normalized amplitude of the block, as in the amplitude attribute.
+    """
+    start, stop, _ = slice(start, stop).indices(self.n_samples)
+    if not self.lazy:
+      return self.amplitude[start:stop]
+    return self._mixdown(start, stop) / self.peak
+
+  def get_pcm(self):
+    """
+    Mono signal in the scale of the PCM format, without the peak normalization of amplitude
+    ---------------------------------------
+    Integer samples are divided by the full scale of their type ([-1, 1), as torchaudio decodes them),
+    float samples are kept. This is the input level of models trained on decoded audio, such as Silero VAD.
+    Returns:
+      - pcm (array): mono mixdown of the signal.
+    """
+    if not self.lazy:
+      return self.amplitude * self._pcm_scale
+    return self._mixdown(0, self.n_samples) / _full_scale(self.data.dtype)
+
+  def get_time(self, start:int, stop:int):
+    """
+    Time (seconds) of the samples in [start, stop)
+    """
+    start, stop, _ = slice(start, stop).indices(self.n_samples)
+    return np.arange(start, stop, 1) / self.fs
+
+  def iter_blocks(self, block_size:int):
+    """
+    Iterate the normalized mono signal block by block
+    ---------------------------------------
+    Args:
+      - block_size (int): number of samples per block.
+    Returns:
+      - generator of arrays with consecutive blocks of the signal.
+    """
+    for start in range(0, self.n_samples, block_size):
+      yield self.get_block(start, start + block_size)
+
+  @property
+  def features(self):
+    """
+    Feature store shared by the stages that process this audio (created on first use with the
+    default memory cap). Assign a FeatureStore to change the cap or the spill directory.
+    """
+    if self._features is None:
+      self._features = FeatureStore(self)
+    return self._features
+
+  @features.setter
+  def features(self, store):
+    self._features = store
+
   def get_info(self):
     if self.channels != 2:
       type_sound = 'mono audio'
@@ -69,7 +205,7 @@ class Audio():
     print('Sampling (Hz) : ',self.fs)
     print('Channels: ' + str(self.channels) + ' type ' + type_sound )
     print('Duration (s): ', self.duration)
-    print('Matrix size: ', len(self.amplitude))
+    print('Matrix size: ', self.n_samples)
 
   def plot_sound_original(self):
     plot_sound(time = self.time, amplitude = self.amplitude, name = self.name)
@@ -83,4 +219,12 @@ class Audio():
 
   def play_sound_filter(self):
     assert self.signal is not None, "The variable signal has not been defined in class"
-    play_sound(amplitude = self.signal, fs = self.fs)
\ No newline at end of file
+    play_sound(amplitude = self.signal, fs = self.fs)
+
+def _full_scale(dtype):
+  """
+  Full scale of a PCM sample type: 2 ** (bits - 1) for integers, 1 for floats.
+  """
+  if np.issubdtype(dtype, np.integer):
+    return float(2 ** (np.iinfo(dtype).bits - 1))
+  return 1.0
\ No newline at end of file
@@ -0,0 +1,130 @@
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+class FeatureStore():
+  def __init__(self, source, fs:float = None, max_bytes:int = 256 * 2**20, spill_dir:str = None):
+    """
+    Lazy cache of the features of one signal
+    ---------------------------------------
+    Each feature is computed on the first request and kept in memory, keyed by its name and
+    parameters, so the stages chained on the same audio do not repeat it (apply_energy_silences
+    keeps the Shannon energy and the average energy of each window here). When the cached features
+    exceed max_bytes the least recently used ones are evicted, and written to spill_dir as .npy
+    files (reloaded memory-mapped) if it is given.
+
+    Arg:
+      - source (Audio or np.array): audio whose normalized amplitude is used, or the signal itself.
+      - fs (float): sampling frequency, required when source is an array.
+      - max_bytes (int): memory cap of the cached features in bytes. Default is 256 MiB.
+      - spill_dir (str): directory for the evicted features. None drops them. Default is None.
+    Methods:
+      - get: Cached value of a key, computed with a function on a miss
+      - holds: Whether an array is the signal of the store
+      - evict: Drop features from memory
+      - stats: Hits, misses, spills and memory in use
+    """
+    if isinstance(source, np.ndarray):
+      assert fs is not None, "fs is required when the source is an array"
+      self._signal, self._audio, self.fs = source, None, fs
+    else:
+      self._signal, self._audio, self.fs = None, source, source.fs
+    self.max_bytes = max_bytes
+    self.spill_dir = spill_dir
+    self.name = "signal" if self._audio is None else os.path.splitext(self._audio.name)[0]
+    self._cache = OrderedDict()
+    self._spilled = {}
+    self._nbytes = 0
+    self._stats = {"hits": 0, "misses": 0, "spills": 0}
+
+  @property
+  def signal(self):
+    """
+    Normalized mono signal. For a lazy Audio it is built once and cached as a feature.
+    """
+    if self._signal is not None:
+      return self._signal
+    if not self._audio.lazy:
+      return self._audio.amplitude
+    return self.get(("signal",), lambda: self._audio.amplitude)
+
+  def get(self, key:tuple, compute):
+    """
+    Cached value of key, calling compute() to create it on a miss.
+
+    Args:
+      - key (tuple): hashable key, for example (name, window).
+      - compute (callable): function without arguments that returns a np.array.
+    Returns:
+      - np.array: the cached array (read-only memmap if it was spilled to disk). It is shared by
+        every caller, do not modify it.
+    """
+    if key in self._cache:
+      self._cache.move_to_end(key)
+      self._stats["hits"] += 1
+      return self._cache[key]
+    if key in self._spilled:
+      self._stats["hits"] += 1
+      return np.load(self._spilled[key], mmap_mode="r")
+
+    self._stats["misses"] += 1
+    value = np.asarray(compute())
+    if value.nbytes > self.max_bytes:
+      # Larger than the whole cap: straight to disk, or not cached
+      self._spill(key, value)
+      return value
+    self._cache[key] = value
+    self._nbytes += value.nbytes
+    while self._nbytes > self.max_bytes:
+      self._evict_oldest()
+    return value
+
+  def holds(self, signal):
+    """
+    True if signal is the signal of the store (the same array, or a view of the same samples).
+    Stages that receive an array and a store only use the store in that case.
+    """
+    own = self.signal
+    signal = np.asarray(signal)
+    return signal is own or (signal.shape == own.shape and signal.dtype == own.dtype and signal.strides == own.strides
+                             and signal.__array_interface__["data"][0] == own.__array_interface__["data"][0])
+
+  def evict(self, key:tuple = None):
+    """
+    Drop a feature (or every feature when key is None) from memory and from the spill directory.
+    """
+    keys = list(self._cache) + list(self._spilled) if key is None else [key]
+    for k in keys:
+      value = self._cache.pop(k, None)
+      if value is not None:
+        self._nbytes -= value.nbytes
+      path = self._spilled.pop(k, None)
+      if path is not None and os.path.exists(path):
+        os.remove(path)
+
+  def __contains__(self, key:tuple):
+    return key in self._cache or key in self._spilled
+
+  def stats(self):
+    """
+    Returns:
+      - dict: hits, misses, spills, bytes in memory (nbytes) and number of features in memory and on disk.
+    """
+    return dict(self._stats, nbytes=self._nbytes, in_memory=len(self._cache), on_disk=len(self._spilled))
+
+  def _evict_oldest(self):
+    key, value = self._cache.popitem(last=False)
+    self._nbytes -= value.nbytes
+    self._spill(key, value)
+
+  def _spill(self, key, value):
+    if self.spill_dir is None:
+      return
+    os.makedirs(self.spill_dir, exist_ok=True)
+    file_name = re.sub(r"[^\w.-]", "_", "_".join([self.name] + [str(k) for k in key])) + ".npy"
+    path = os.path.join(self.spill_dir, file_name)
+    np.save(path, value)
+    self._spilled[key] = path
+    self._stats["spills"] += 1
@@ -0,0 +1,171 @@
+import numpy as np
+
+from fonoSemillIAS.others.process_result import create_pulse
+
+class IntervalSet():
+    def __init__(self, array_sample_start, array_sample_end, n_samples=None, dtype=np.float64):
+        """
+        Set of half-open sample intervals [start, end), a compact alternative to the dense pulse.
+
+        The intervals are stored sorted, without empty intervals and with the overlapping or
+        touching intervals merged, so two sets with the same pulse have the same arrays.
+        Converting the set to an array (np.asarray, plots, arithmetic with arrays) builds the
+        same pulse as create_pulse.
+
+        Args:
+        array_sample_start (list): List of starting sample indices.
+        array_sample_end (list): List of ending sample indices.
+        n_samples (int): Length of the reference signal, needed for complement and the pulse.
+        dtype (numpy.dtype): Data type of the pulse (the dtype of the reference signal).
+        """
+        self.start, self.end = _normalize(np.asarray(array_sample_start, dtype=np.int64),
+                                          np.asarray(array_sample_end, dtype=np.int64))
+        self.n_samples = n_samples
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def from_pulse(cls, pulse):
+        """
+        Create the interval set of the non-zero samples of a pulse.
+        """
+        pulse = np.asarray(pulse)
+        edges = np.diff(np.concatenate([[0], (pulse != 0).astype(np.int8), [0]]))
+        return cls(np.where(edges == 1)[0], np.where(edges == -1)[0], n_samples=len(pulse), dtype=pulse.dtype)
+
+    @classmethod
+    def from_dataframe(cls, data_silence, n_samples=None, dtype=np.float64):
+        """
+        Create the interval set of a silence table with start_sample and end_sample columns.
+        """
+        return cls(data_silence["start_sample"].values, data_silence["end_sample"].values,
+                   n_samples=n_samples, dtype=dtype)
+
+    def __repr__(self):
+        return f"IntervalSet(n_intervals={len(self.start)}, n_samples={self.n_samples})"
+
+    def __eq__(self, other):
+        if not isinstance(other, IntervalSet):
+            return NotImplemented
+        return np.array_equal(self.start, other.start) and np.array_equal(self.end, other.end)
+
+    def __array__(self, dtype=None, copy=None):
+        pulse = self.to_pulse()
+        return pulse if dtype is None else pulse.astype(dtype)
+
+    @property
+    def n_intervals(self):
+        return len(self.start)
+
+    @property
+    def durations(self):
+        """
+        Length in samples of each interval.
+        """
+        return self.end - self.start
+
+    def total(self):
+        """
+        Number of samples covered by the set (the sum of the pulse).
+        """
+        return int(np.sum(self.durations))
+
+    def to_pulse(self, signal_ref=None):
+        """
+        Build the dense pulse: 1s inside the intervals and 0s elsewhere.
+
+        Args:
+        signal_ref (numpy.ndarray): Reference signal. If None, n_samples and dtype of the set are used.
+
+        Returns:
+        numpy.ndarray: Pulse signal.
+        """
+        if signal_ref is None:
+            assert self.n_samples is not None, "n_samples has not been defined in the interval set"
+            signal_ref = np.empty(self.n_samples, dtype=self.dtype)
+        return create_pulse(signal_ref = signal_ref, array_sample_start = self.start, array_sample_end = self.end)
+
+    def _new(self, array_sample_start, array_sample_end, other=None):
+        n_samples = self.n_samples
+        if n_samples is None and other is not None:
+            n_samples = other.n_samples
+        return IntervalSet(array_sample_start, array_sample_end, n_samples=n_samples, dtype=self.dtype)
+
+    def union(self, other):
+        """
+        Samples inside self or other.
+        """
+        return self._new(*_coverage(self, other, minimum=1), other=other)
+
+    def intersection(self, other):
+        """
+        Samples inside self and other.
+        """
+        return self._new(*_coverage(self, other, minimum=2), other=other)
+
+    def complement(self, n_samples=None):
+        """
+        Samples of [0, n_samples) outside the set.
+        """
+        n_samples = self.n_samples if n_samples is None else n_samples
+        assert n_samples is not None, "n_samples has not been defined in the interval set"
+        starts = np.clip(np.concatenate([[0], self.end]), 0, n_samples)
+        ends = np.clip(np.concatenate([self.start, [n_samples]]), 0, n_samples)
+        return IntervalSet(starts, ends, n_samples=n_samples, dtype=self.dtype)
+
+    def filter_duration(self, min_samples):
+        """
+        Keep only the intervals with at least min_samples samples.
+        """
+        keep = self.durations >= min_samples
+        return self._new(self.start[keep], self.end[keep])
+
+    def dice(self, other):
+        """
+        Dice coefficient between the pulses of self and other, computed on the intervals.
+        """
+        denominator = self.total() + other.total()
+        if denominator == 0:
+            return np.nan
+        return (2. * self.intersection(other).total()) / denominator
+
+    def iou(self, other):
+        """
+        Intersection over union between the pulses of self and other, computed on the intervals.
+        """
+        union = self.union(other).total()
+        if union == 0:
+            return np.nan
+        return self.intersection(other).total() / union
+
+def _normalize(start, end):
+    """
+    Sort the intervals, drop the empty ones and merge the overlapping or touching ones.
+    """
+    keep = end > start
+    start, end = start[keep], end[keep]
+    if len(start) == 0:
+        return start, end
+    order = np.argsort(start, kind="stable")
+    start, end = start[order], end[order]
+    # A new interval begins where the start is after every previous end
+    reach = np.maximum.accumulate(end)
+    new = np.concatenate([[True], start[1:] > reach[:-1]])
+    group = np.cumsum(new) - 1
+    merged_end = np.zeros(group[-1] + 1, dtype=np.int64)
+    np.maximum.at(merged_end, group, end)
+    return start[new], merged_end
+
+def _coverage(*sets, minimum):
+    """
+    Intervals covered by at least `minimum` of the given sets, with a sweep over their edges.
+    """
+    positions = np.concatenate([np.concatenate([s.start, s.end]) for s in sets])
+    deltas = np.concatenate([np.concatenate([np.ones(len(s.start), dtype=np.int64),
+                                             -np.ones(len(s.end), dtype=np.int64)]) for s in sets])
+    if len(positions) == 0:
+        return positions, positions
+    positions, inverse = np.unique(positions, return_inverse=True)
+    count = np.cumsum(np.bincount(inverse, weights=deltas).astype(np.int64))
+    # count[i] is the number of sets covering [positions[i], positions[i + 1])
+    covered = np.where(count[:-1] >= minimum)[0]
+    return positions[covered], positions[covered + 1]
@@ -1,57 +1,124 @@
 
 import numpy as np
 
+from fonoSemillIAS.others.intervals import IntervalSet
+
 def dice_coefficient(y_true, y_pred):
     """
     Compute the Dice coefficient between two binary arrays.
     
     Args:
-    y_true (numpy.ndarray): Ground truth binary array.
-    y_pred (numpy.ndarray): Predicted binary array.
+    y_true (numpy.ndarray or IntervalSet): Ground truth binary array.
+    y_pred (numpy.ndarray or IntervalSet): Predicted binary array.
     
     Returns:
     float: Dice coefficient value.
     """
+    if isinstance(y_true, IntervalSet) or isinstance(y_pred, IntervalSet):
+        # Computed on the intervals, without building the pulses
+        return _as_intervals(y_true).dice(_as_intervals(y_pred))
     intersection = np.sum(y_true * y_pred)
     return (2. * intersection) / (np.sum(y_true) + np.sum(y_pred))
 
+def iou_coefficient(y_true, y_pred):
+    """
+    Compute the intersection over union between two binary arrays.
+    
+    Args:
+    y_true (numpy.ndarray or IntervalSet): Ground truth binary array.
+    y_pred (numpy.ndarray or IntervalSet): Predicted binary array.
+    
+    Returns:
+    float: IoU value.
+    """
+    return _as_intervals(y_true).iou(_as_intervals(y_pred))
+
+def _as_intervals(pulse):
+    if isinstance(pulse, IntervalSet):
+        return pulse
+    return IntervalSet.from_pulse(pulse)
+
 def deltas_lobes(df_tag_silences, data_detec_silence):
-    delta_start = []
-    for i in range(len(df_tag_silences)):
-        tg = df_tag_silences.iloc[i]
-
-        for j in range(len(data_detec_silence)):
-            dect = data_detec_silence.iloc[j]
-            if tg.start_sample <= dect.start_sample and dect.start_sample <= tg.end_sample:
-                delta_start.append(  dect.start_time - tg.start_time )
-                break
-            elif dect.start_sample <= tg.start_sample and tg.start_sample <= dect.end_sample:
-                delta_start.append(  tg.start_time - dect.start_time )
-                break
-            elif dect.start_sample > tg.end_sample: 
-                break
-
-        if len(delta_start) < i + 1: 
-            delta_start.append("inf")
-
-    delta_end = []
-    for i in range(len(df_tag_silences)):
-        tg = df_tag_silences.iloc[i]
-
-        for j in range(len(data_detec_silence)):
-            dect = data_detec_silence.iloc[j]
-            if tg.start_sample <= dect.end_sample and dect.end_sample <= tg.end_sample:
-                delta_end.append(  tg.end_time - dect.end_time )
-                break
-            elif dect.start_sample <= tg.end_sample and tg.end_sample <= dect.end_sample:
-                delta_end.append(  dect.end_time - tg.end_time  )
-                break
-            elif dect.start_sample > tg.end_sample: 
-                break
-
-        if len(delta_end) < i + 1: 
-            delta_end.append("inf")
-
-    return delta_start, delta_end
-
-    
\ No newline at end of file
+    """
+    Compute the start and end deltas (seconds) between tagged silences and detected silences.
+
+    Each tagged silence is matched with the first detected silence (in start order) that overlaps it.
+
+    Args:
+    df_tag_silences (pandas.DataFrame): Ground truth silences with start_sample, end_sample, start_time and end_time.
+    data_detec_silence (pandas.DataFrame): Detected silences with the same columns.
+
+    Returns:
+    tuple: Two arrays with one value per tagged silence, NaN where no detected silence overlaps it:
+        - delta_start: Distance between the start times.
+        - delta_end: Distance between the end times.
+    """
+    return deltas_lobes_batch([(df_tag_silences, data_detec_silence)])[0]
+
+def deltas_lobes_batch(pairs):
+    """
+    Compute deltas_lobes for many (tagged, detected) pairs in one call.
+
+    All the pairs are shifted to disjoint sample ranges and matched together with a single
+    np.searchsorted sweep, so a whole evaluation corpus costs O((n + m) log m).
+
+    Args:
+    pairs (list of tuples): List of (df_tag_silences, data_detec_silence) DataFrames.
+
+    Returns:
+    list of tuples: (delta_start, delta_end) arrays for each pair, in input order.
+    """
+    pairs = list(pairs)
+    if len(pairs) == 0:
+        return []
+
+    tag_start, tag_end, tag_start_time, tag_end_time = [], [], [], []
+    det_start, det_end, det_start_time, det_end_time = [], [], [], []
+    offset = 0
+    for df_tag_silences, data_detec_silence in pairs:
+        # Matching takes the first overlapping detection in start order
+        data_detec_silence = data_detec_silence.sort_values("start_sample", kind="stable")
+        tag = [np.asarray(df_tag_silences[c].values, dtype=np.int64) for c in ["start_sample", "end_sample"]]
+        det = [np.asarray(data_detec_silence[c].values, dtype=np.int64) for c in ["start_sample", "end_sample"]]
+
+        tag_start.append(tag[0] + offset); tag_end.append(tag[1] + offset)
+        det_start.append(det[0] + offset); det_end.append(det[1] + offset)
+        tag_start_time.append(np.asarray(df_tag_silences["start_time"].values, dtype=np.float64))
+        tag_end_time.append(np.asarray(df_tag_silences["end_time"].values, dtype=np.float64))
+        det_start_time.append(np.asarray(data_detec_silence["start_time"].values, dtype=np.float64))
+        det_end_time.append(np.asarray(data_detec_silence["end_time"].values, dtype=np.float64))
+
+        # Next pair starts after every sample of this one
+        offset += max([int(np.max(a)) for a in tag + det if len(a)] + [0]) + 2
+
+    tag_start, tag_end = np.concatenate(tag_start), np.concatenate(tag_end)
+    det_start, det_end = np.concatenate(det_start), np.concatenate(det_end)
+    tag_start_time, tag_end_time = np.concatenate(tag_start_time), np.concatenate(tag_end_time)
+    det_start_time, det_end_time = np.concatenate(det_start_time), np.concatenate(det_end_time)
+
+    delta_start = np.full(len(tag_start), np.nan)
+    delta_end = np.full(len(tag_start), np.nan)
+    if len(det_start):
+        # First detection ending at or after the tag start (running max handles overlapping detections)
+        first = np.searchsorted(np.maximum.accumulate(det_end), tag_start, side="left")
+        # Detections from here on start after the tag end
+        last = np.searchsorted(det_start, tag_end, side="right")
+        matched = first < last
+        j = first[matched]
+
+        start_inside = det_start[j] >= tag_start[matched]
+        delta_start[matched] = np.where(start_inside,
+                                        det_start_time[j] - tag_start_time[matched],
+                                        tag_start_time[matched] - det_start_time[j])
+        end_inside = det_end[j] <= tag_end[matched]
+        delta_end[matched] = np.where(end_inside,
+                                      tag_end_time[matched] - det_end_time[j],
+                                      det_end_time[j] - tag_end_time[matched])
+
+    results = []
+    first_tag = 0
+    for df_tag_silences, _ in pairs:
+        n = len(df_tag_silences)
+        results.append((delta_start[first_tag:first_tag + n], delta_end[first_tag:first_tag + n]))
+        first_tag += n
+    return results
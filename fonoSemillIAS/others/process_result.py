@@ -55,6 +55,26 @@ def time2sample(array_time_start, array_time_end, fs):
 
     return array_sample_start, array_sample_end, diff
 
+def segments2gaps(array_start, array_end, end_value, start_value=0):
+    """
+    Convert sorted segments (speech, words) into the gaps between them.
+    
+    Args:
+    array_start (list): List of starting points (samples or seconds) of the segments.
+    array_end (list): List of ending points of the segments.
+    end_value (int or float): End of the signal, closes the trailing gap.
+    start_value (int or float): Start of the signal, opens the leading gap. Default is 0.
+    
+    Returns:
+    tuple: A tuple containing two arrays:
+        - gap_start: [start_value, end of each segment].
+        - gap_end: [start of each segment, end_value].
+      Without segments the whole signal is a single gap.
+    """
+    gap_start = np.concatenate([[start_value], np.asarray(array_end)])
+    gap_end = np.concatenate([np.asarray(array_start), [end_value]])
+    return gap_start, gap_end
+
 def create_pulse(signal_ref, array_sample_start, array_sample_end):
     """
     Create a pulse signal based on reference signal and specified sample ranges.
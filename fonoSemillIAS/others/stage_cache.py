@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+class StageCache():
+    def __init__(self, cache_dir: str, max_bytes: int = 4 * 2**30) -> None:
+        """
+        Content-addressed on-disk cache of the results of the pipeline stages.
+
+        The key of a result is the hash of the key of its input plus the stage name and its
+        parameters, and the first key is the hash of the audio samples. A changed parameter changes
+        the key of its stage and of every stage after it, so a repeated run only recomputes from
+        that stage onward. Signals are stored as .npy (and returned memory-mapped) and tables as
+        Parquet (pickle when pyarrow is not installed). When the directory exceeds max_bytes the
+        least recently used results are deleted.
+
+        Args:
+        - cache_dir (str): Directory of the cache, shared between runs and processes.
+        - max_bytes (int): Size limit of the directory in bytes. Default is 4 GiB.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def content_key(signal) -> str:
+        """
+        Key of a signal: hash of its dtype, shape and bytes.
+        """
+        signal = np.ascontiguousarray(signal)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{signal.dtype.str}{signal.shape}".encode())
+        digest.update(memoryview(signal).cast("B"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(parent: str, stage: str, params: dict = None) -> str:
+        """
+        Key of the result of stage applied to the input with key parent.
+        """
+        description = json.dumps([parent, stage, params or {}], sort_keys=True, default=str)
+        return hashlib.blake2b(description.encode(), digest_size=20).hexdigest()
+
+    def run(self, parent: str, stage: str, params: dict, compute):
+        """
+        Result of a stage, loaded from the cache or computed and stored.
+
+        Args:
+        - parent (str): Key of the input of the stage (content_key of the audio or key of the previous stage).
+        - stage (str): Name of the stage, for example "DWT_filter".
+        - params (dict): Parameters that change the result, for example {"wavelet": "sym10", "level": 5}.
+        - compute (callable): Function without arguments that computes the result (np.array or DataFrame).
+
+        Returns:
+        - value (np.array or DataFrame): The result. Cached signals are read-only memmaps.
+        - key (str): Key of the result, the parent of the next stage.
+        """
+        key = self.key(parent, stage, params)
+        path = self._find(key)
+        if path is not None:
+            try:
+                # Touch the file: the modification time is the last use of the LRU policy
+                os.utime(path)
+                value = self._load(path)
+                self.hits += 1
+                return value, key
+            except FileNotFoundError:
+                # Evicted by another process in the meantime
+                pass
+
+        self.misses += 1
+        value = compute()
+        self._store(key, value)
+        self._evict()
+        return value, key
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def size(self) -> int:
+        """
+        Size of the cached results in bytes.
+        """
+        return sum(os.path.getsize(path) for path in self._files())
+
+    def clear(self) -> None:
+        for path in self._files():
+            os.remove(path)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "n_results": len(self._files()), "bytes": self.size()}
+
+    def _files(self):
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if name.endswith((".npy", ".parquet", ".pkl"))]
+
+    def _find(self, key):
+        for extension in [".npy", ".parquet", ".pkl"]:
+            path = os.path.join(self.cache_dir, key + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, path):
+        if path.endswith(".npy"):
+            return np.load(path, mmap_mode="r")
+        if path.endswith(".parquet"):
+            return pd.read_parquet(path)
+        return pd.read_pickle(path)
+
+    def _store(self, key, value):
+        if isinstance(value, pd.DataFrame):
+            path = os.path.join(self.cache_dir, key + (".parquet" if pyarrow is not None else ".pkl"))
+        else:
+            path = os.path.join(self.cache_dir, key + ".npy")
+        # Temporary file unique to this writer: workers storing the same key do not share it
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=key, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                if not isinstance(value, pd.DataFrame):
+                    np.save(fp, np.asarray(value))
+                elif pyarrow is not None:
+                    value.to_parquet(fp, index=False)
+                else:
+                    value.to_pickle(fp)
+            # Atomic rename: other processes never see a partial file
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _evict(self):
+        entries = []
+        for path in self._files():
+            try:
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        # Keep at least the newest result, even if it is larger than the limit
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
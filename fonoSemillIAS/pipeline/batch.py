@@ -0,0 +1,241 @@
+import contextlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+from tqdm import tqdm
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from fonoSemillIAS.audio.Audio import Audio
+from fonoSemillIAS.others.stage_cache import StageCache
+from fonoSemillIAS.pipeline.energySilence import apply_energy_silences
+from fonoSemillIAS.pipeline.preproc import apply_preproc
+from fonoSemillIAS.pipeline.sileroSilence import apply_silero_silences
+from fonoSemillIAS.pipeline.darsSilence import apply_dasr_silences
+
+DETECTORS = ["energy", "silero", "dasr"]
+
+# Columns of the output table and their types
+COLUMNS = {"file": str, "detector": str, "start_sample": "int64", "end_sample": "int64",
+           "start_time": "float64", "end_time": "float64", "diff_time": "float64"}
+SCHEMA = None if pa is None else pa.schema([("file", pa.string()), ("detector", pa.string()),
+                                            ("start_sample", pa.int64()), ("end_sample", pa.int64()),
+                                            ("start_time", pa.float64()), ("end_time", pa.float64()),
+                                            ("diff_time", pa.float64())])
+
+# Models and settings of the worker process, created once by _init_worker
+_WORKER = {}
+
+def run_batch(files, detectors=("energy",), output_path="silences.parquet", preproc=False,
+              n_jobs=None, max_in_flight=None, retries=1, detector_kwargs=None, cache_dir=None):
+    """
+    Runs a chain of silence detectors over a corpus of WAV files across a process pool.
+
+    Each worker loads the models of the chain once (SileroVAD, DiarizationAsr) and reuses them for
+    every file it receives. At most max_in_flight files are submitted at a time, so the decoded audio
+    and the results held in memory do not grow with the size of the corpus. The silence tables are
+    appended to output_path as soon as each file finishes: Parquet when pyarrow is installed, CSV
+    otherwise. A failed file is retried and then skipped, without stopping the batch. When a worker dies
+    (a crash or a failed model load) the files in flight count as failed attempts and the pool is restarted.
+
+    Parameters:
+    - files (list or str): Paths of the WAV files, or a manifest: a .txt file with one path per line,
+                           a .csv file with an "audio_filepath" or "path" column, or a NeMo .json
+                           manifest (one JSON object per line with "audio_filepath").
+    - detectors (list): Detectors applied to every file, from DETECTORS (default is ("energy",)).
+    - output_path (str): Output table. The extension is changed to .csv when pyarrow is not installed
+                         (default is "silences.parquet").
+    - preproc (bool): Apply apply_preproc to the signal before the energy detector (default is False).
+    - n_jobs (int): Number of worker processes. None uses all the CPUs (default is None).
+    - max_in_flight (int): Maximum number of files submitted at the same time. None is 2 * n_jobs (default is None).
+    - retries (int): Number of extra attempts of a failed file (default is 1).
+    - detector_kwargs (dict): Arguments of each detector, keyed by detector name: {"energy": {"window_ms": 5},
+                              "silero": arguments of SileroVAD, "dasr": arguments of DiarizationAsr} (default is None).
+    - cache_dir (str): Directory of a StageCache shared by the workers for the preproc and energy stages (default is None).
+
+    Returns:
+    - report (DataFrame): One row per file with status ("ok" or "failed"), attempts, n_silences,
+                          seconds and error.
+    - output_path (str): Path of the silence table, with the columns of the silence tables plus
+                         file and detector.
+    """
+    detectors = list(detectors)
+    assert all(detector in DETECTORS for detector in detectors), "detector not permited"
+    files = read_manifest(files) if isinstance(files, str) else list(files)
+    n_jobs = n_jobs or os.cpu_count()
+    max_in_flight = max_in_flight or 2 * n_jobs
+    output_path = _output_path(output_path)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    writer = None
+    executor = None
+    report = {}
+    attempts = {file: 0 for file in files}
+    pending = list(reversed(files))
+    progress_bar = tqdm(total=len(files), desc='Files', position=0)
+    try:
+        in_flight = {}
+        while pending or in_flight:
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                               initargs=(detectors, preproc, detector_kwargs or {}, cache_dir))
+            # Keep at most max_in_flight files submitted
+            broken = False
+            while pending and len(in_flight) < max_in_flight:
+                file = pending.pop()
+                attempts[file] += 1
+                try:
+                    in_flight[executor.submit(_process_file, file)] = file
+                except BrokenProcessPool:
+                    pending.append(file)
+                    attempts[file] -= 1
+                    broken = True
+                    break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file = in_flight.pop(future)
+                table, error, seconds = _result(future)
+                broken = broken or isinstance(future.exception(), BrokenProcessPool)
+                if error is not None and attempts[file] <= retries:
+                    pending.append(file)
+                    continue
+
+                if error is None:
+                    try:
+                        writer = _write_table(writer, output_path, table)
+                    except Exception:
+                        error = traceback.format_exc()
+                report[file] = {"file": file, "status": "ok" if error is None else "failed",
+                                "attempts": attempts[file],
+                                "n_silences": None if table is None else len(table),
+                                "seconds": seconds, "error": error}
+                progress_bar.update(1)
+                progress_bar.set_postfix(failed=sum(r["status"] == "failed" for r in report.values()))
+
+            if broken:
+                # A worker died: the pool does not take new files, start a new one
+                executor.shutdown(wait=True, cancel_futures=True)
+                executor = None
+    finally:
+        progress_bar.close()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if writer is not None and pq is not None:
+            writer.close()
+
+    report = pd.DataFrame([report[file] for file in files if file in report],
+                          columns=["file", "status", "attempts", "n_silences", "seconds", "error"])
+    tqdm.write(f"Batch finished: {int((report['status'] == 'ok').sum())} ok, "
+               f"{int((report['status'] == 'failed').sum())} failed of {len(files)} files")
+    return report, output_path
+
+def read_manifest(manifest_path):
+    """
+    Reads the WAV paths of a manifest (.txt, .csv or NeMo .json, see run_batch).
+    """
+    if manifest_path.endswith(".csv"):
+        data = pd.read_csv(manifest_path)
+        column = "audio_filepath" if "audio_filepath" in data.columns else "path"
+        return data[column].tolist()
+    with open(manifest_path, "r") as fp:
+        lines = [line.strip() for line in fp if line.strip()]
+    if manifest_path.endswith(".json"):
+        return [json.loads(line)["audio_filepath"] for line in lines]
+    return lines
+
+def _output_path(output_path):
+    root, extension = os.path.splitext(output_path)
+    if pq is None and extension == ".parquet":
+        return root + ".csv"
+    return output_path
+
+def _write_table(writer, output_path, table):
+    """
+    Appends the silence table of one file to the output, returns the Parquet writer (None for CSV).
+
+    The columns are converted to COLUMNS first, so an empty table (object columns) or a detector
+    with float samples writes SCHEMA as the rest.
+    """
+    table = table[list(COLUMNS)].astype(COLUMNS)
+    if pq is None or not output_path.endswith(".parquet"):
+        table.to_csv(output_path, mode="a", header=not os.path.exists(output_path), index=False)
+        return writer
+    if writer is None:
+        writer = pq.ParquetWriter(output_path, SCHEMA)
+    writer.write_table(pa.Table.from_pandas(table, schema=SCHEMA, preserve_index=False))
+    return writer
+
+def _result(future):
+    """
+    Result of _process_file, or the error of the pool when the worker died before returning it.
+    """
+    try:
+        return future.result()
+    except Exception:
+        return None, traceback.format_exc(), None
+
+def _init_worker(detectors, preproc, detector_kwargs, cache_dir):
+    """
+    Warmup of a worker process: the models of the chain are loaded once per worker.
+    """
+    _WORKER.update(detectors=detectors, preproc=preproc, kwargs=detector_kwargs, models={},
+                   cache=None if cache_dir is None else StageCache(cache_dir))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        if "silero" in detectors:
+            from fonoSemillIAS.Silence.silero_vad import SileroVAD
+            _WORKER["models"]["silero"] = SileroVAD(**detector_kwargs.get("silero", {}))
+        if "dasr" in detectors:
+            from fonoSemillIAS.STT.diarization_asr import DiarizationAsr
+            kwargs = dict(detector_kwargs.get("dasr", {}))
+            # Every worker writes its manifests and outputs in its own folder
+            kwargs["work_path"] = os.path.join(kwargs.get("work_path", "."), f"worker_{os.getpid()}")
+            os.makedirs(kwargs["work_path"], exist_ok=True)
+            _WORKER["models"]["dasr"] = DiarizationAsr(**kwargs)
+
+def _process_file(file):
+    """
+    Runs the detector chain on one file in a worker.
+
+    Returns:
+    - table (DataFrame): Silences of every detector with the file and detector columns, None on error.
+    - error (str): Traceback of the error, None on success.
+    - seconds (float): Processing time.
+    """
+    start = time.perf_counter()
+    try:
+        # The pipelines report their steps with tqdm and print: keep the batch output clean
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            tables = [_apply_detector(detector, file) for detector in _WORKER["detectors"]]
+        return pd.concat(tables, ignore_index=True), None, time.perf_counter() - start
+    except Exception:
+        return None, traceback.format_exc(), time.perf_counter() - start
+
+def _apply_detector(detector, file):
+    wav = Audio(file)
+    if detector == "energy":
+        signal = wav.amplitude
+        if _WORKER["preproc"]:
+            # One process per file already: no nested pools
+            signal = apply_preproc(signal, wav.fs, torch=False, n_jobs=1, cache=_WORKER["cache"])
+        data_silence, _ = apply_energy_silences(signal, wav.fs, cache=_WORKER["cache"], **_WORKER["kwargs"].get("energy", {}))
+    elif detector == "silero":
+        data_silence, _, _ = apply_silero_silences(_WORKER["models"]["silero"], file, wav)
+    else:
+        data_silence = apply_dasr_silences(_WORKER["models"]["dasr"], file, wav)[0]
+
+    data_silence = data_silence[["start_sample", "end_sample", "start_time", "end_time", "diff_time"]].copy()
+    data_silence.insert(0, "detector", detector)
+    data_silence.insert(0, "file", file)
+    return data_silence
@@ -3,6 +3,7 @@ import json
 import pandas as pd
 
 from fonoSemillIAS.others.process_result import *
+from fonoSemillIAS.others.intervals import IntervalSet
 
 def apply_dasr_silences(DASR, filename, wav):
     try:
@@ -24,42 +25,18 @@ def apply_dasr_silences(DASR, filename, wav):
 
         # Transform results
         tqdm.write("Start step 3: Transform data")
-        st = {
-            "word": [],
-            "start_time": [],
-            "end_time": [],
-            }
+        df = pd.DataFrame({
+            "word": [stamps["word"] for stamps in datos_json["words"]],
+            "start_time": np.array([round(stamps["start_time"], 3) for stamps in datos_json["words"]], dtype=float),
+            "end_time": np.array([round(stamps["end_time"], 3) for stamps in datos_json["words"]], dtype=float),
+            })
 
-        for stamps in datos_json["words"]:
-            st["word"].append(stamps["word"])
+        gap_start, gap_end = segments2gaps(array_start = df["start_time"].values,
+                                           array_end = df["end_time"].values,
+                                           end_value = round(wav.duration, 3),
+                                           start_value = 0.000)
 
-            t1 = round(stamps["start_time"], 3)
-            t2 = round(stamps["end_time"], 3)
-
-            st["start_time"].append( t1 )
-            st["end_time"].append( t2 )
-
-            df = pd.DataFrame(st)
-
-        st = []
-
-        for i in range(len(df)-1):
-            start = df.iloc[i]["start_time"]
-            end = df.iloc[i]["end_time"]
-
-            start_b = df.iloc[i+1]["start_time"]
-            end_b = df.iloc[i+1]["end_time"]
-
-            if i == 0:
-                st.append([0.000, start])
-                st.append([end, start_b])
-            elif i == len(df) - 2:
-                st.append([end, start_b])
-                st.append([end_b, round(wav.duration, 3)])
-            else:
-                st.append([end, start_b])
-
-        data_silence = pd.DataFrame(st, columns = ["start_time","end_time"])
+        data_silence = pd.DataFrame({"start_time": gap_start, "end_time": gap_end})
 
 
         arr_time_start, arr_time_end, diff = time2sample(array_time_start = data_silence["start_time"].values, 
@@ -73,9 +50,7 @@ def apply_dasr_silences(DASR, filename, wav):
         data_silence = data_silence.reset_index(drop = True)
         data_silence["new_silences"] = [True] * len(data_silence)
 
-        pulse_detec = create_pulse(signal_ref = wav.amplitude, 
-                                   array_sample_start = data_silence["start_sample"].values, 
-                                   array_sample_end = data_silence["end_sample"].values)
+        pulse_detec = IntervalSet.from_dataframe(data_silence, n_samples = wav.n_samples, dtype = np.float64)
 
         progress_bar.update(1)
         # Close progress bar
@@ -2,8 +2,9 @@ from tqdm import tqdm
 import pandas as pd
 from fonoSemillIAS.Silence.activateEnergy import *
 from fonoSemillIAS.others.process_result import *
+from fonoSemillIAS.others.intervals import IntervalSet
 
-def apply_energy_silences(signal, fs, window_ms=5,):
+def apply_energy_silences(signal, fs, window_ms=5, features=None, cache=None, fused=False, hop_ms=None):
     """
     Applies energy-based silences detection algorithm to a given signal.
 
@@ -13,52 +14,92 @@ def apply_energy_silences(signal, fs, window_ms=5,):
     - window_ms (int): Size of the moving window for average energy calculation in milliseconds (default is 5 ms).
     - output (str): Specifies the output format. Can be "intervals" to return only the intervals of silence,
                     or "all" to return additional information including the pulse, envelogram, and all intervals.
+    - features (FeatureStore): Feature store of the signal (for example Audio.features). The energy and
+                               average energy are taken from it and cached there for the next calls. It is
+                               only used when signal is the signal of the store (wav.amplitude of an eager
+                               Audio, or wav.features.signal) (default is None).
+    - cache (StageCache): On-disk stage cache. The energy, the average energy and the silence intervals are
+                          stored there keyed by the signal and window, and reused by later runs (default is None).
+    - fused (bool): Run steps 1 to 4 with detect_silences (compiled kernel when numba is installed), without
+                    materializing the intermediate signals. The features store is not used (default is False).
+    - hop_ms (float): Detect on a frame-rate envelope with this hop in milliseconds and refine the boundaries
+                      to the sample (detect_silences_multires). None detects at the sample rate. The features
+                      store is not used (default is None).
 
     Returns:
     - result (dict): Dictionary containing the output based on the specified format   
+    - pulse_detec (IntervalSet): Detected silences. The dense pulse is built with to_pulse() or np.asarray.
     """
 
     try:
         # Initialize progress bar
         progress_bar = tqdm(total=6, desc='Progress', position=0)
 
-        # Step 1: Energy signal
-        tqdm.write("Start step 1: Energy signal")
-        energy_wave = shannon_energy(signal = signal)
-        # Update progress bar
-        progress_bar.update(1)
-
-        # Step 2: Average energy
-        tqdm.write("Start step 2: Average energy")
-        window = window_ms * 0.001
-        average_energy = avr_energy(energy_sequence = energy_wave, window_move = int(window * fs))
-        # Update progress bar
-        progress_bar.update(1)
-
-        # Step 3: Envelogram
-        tqdm.write("Start step 3: Envelogram")
-        envelogram_wave = envelogram(average_energy_sequence = average_energy)
-        # Update progress bar
-        progress_bar.update(1)
-
-        # Step 4: Detection of silences
-        ## Sub-step 4.1: Zero crossing
-        tqdm.write("Start step 4.1: Zero crossing")
-        zero_crossing = find_zero_crossings(envelogram = envelogram_wave)
-        # Update progress bar
-        progress_bar.update(1)
-
-        ## Sub-step 4.2: Identify lobes
-        tqdm.write("Start step 4.2: Identify lobes")
-        lobe_indices = identify_lobes(envelogram = envelogram_wave, zero_crossings = zero_crossing)
-        # Update progress bar
-        progress_bar.update(1)
-
-        ## Sub-step 4.3: Transform silence lobes into pulse
-        tqdm.write("Start step 4.3: Transform silence lobes into pulse")
-        intervals = identify_silence(envelogram = envelogram_wave, lobe_indices = lobe_indices)
-        
-        data_silence = pd.DataFrame(intervals, columns = ["start_sample","end_sample"])
+        if hop_ms is not None:
+            tqdm.write("Start steps 1-4: Frame-rate detection of silences")
+            window_move = int(window_ms * 0.001 * fs)
+            hop = max(1, int(hop_ms * 0.001 * fs))
+            detect = lambda: pd.DataFrame(detect_silences_multires(signal = signal, window_move = window_move, hop = hop),
+                                          columns = ["start_sample","end_sample"])
+            key = None if cache is None else cache.content_key(signal)
+            data_silence, key = _run_stage(cache, key, None, "detect_silences_multires",
+                                           {"window_move": window_move, "hop": hop}, detect)
+        elif fused:
+            tqdm.write("Start steps 1-4: Fused detection of silences")
+            window_move = int(window_ms * 0.001 * fs)
+            detect = lambda: pd.DataFrame(detect_silences(signal = signal, window_move = window_move),
+                                          columns = ["start_sample","end_sample"])
+            key = None if cache is None else cache.content_key(signal)
+            data_silence, key = _run_stage(cache, key, None, "detect_silences", {"window_move": window_move}, detect)
+        else:
+            # Step 1: Energy signal
+            tqdm.write("Start step 1: Energy signal")
+            key = None if cache is None else cache.content_key(signal)
+            # The store only serves its own signal: a different array is computed without it
+            if features is not None and not features.holds(signal):
+                features = None
+            energy_wave, key = _run_stage(cache, key, features, "shannon_energy", {},
+                                          lambda: shannon_energy(signal = signal))
+            # Update progress bar
+            progress_bar.update(1)
+
+            # Step 2: Average energy
+            tqdm.write("Start step 2: Average energy")
+            window = window_ms * 0.001
+            average_energy, key = _run_stage(cache, key, features, "avr_energy", {"window_move": int(window * fs)},
+                                             lambda: avr_energy(energy_sequence = energy_wave, window_move = int(window * fs)))
+            # Update progress bar
+            progress_bar.update(1)
+
+            def detect_intervals():
+                # Step 3: Envelogram
+                tqdm.write("Start step 3: Envelogram")
+                envelogram_wave = envelogram(average_energy_sequence = average_energy)
+                # Update progress bar
+                progress_bar.update(1)
+
+                # Step 4: Detection of silences
+                ## Sub-step 4.1: Zero crossing
+                tqdm.write("Start step 4.1: Zero crossing")
+                zero_crossing = find_zero_crossings(envelogram = envelogram_wave)
+                # Update progress bar
+                progress_bar.update(1)
+
+                ## Sub-step 4.2: Identify lobes
+                tqdm.write("Start step 4.2: Identify lobes")
+                lobe_indices = identify_lobes(envelogram = envelogram_wave, zero_crossings = zero_crossing)
+                # Update progress bar
+                progress_bar.update(1)
+
+                ## Sub-step 4.3: Transform silence lobes into intervals
+                tqdm.write("Start step 4.3: Transform silence lobes into intervals")
+                intervals = identify_silence(envelogram = envelogram_wave, lobe_indices = lobe_indices)
+                return pd.DataFrame(intervals, columns = ["start_sample","end_sample"])
+
+            # The table is not a frame feature: only the stage cache keeps it
+            data_silence, key = _run_stage(cache, key, None, "energy_intervals", {}, detect_intervals)
+        data_silence = data_silence.copy()
+        progress_bar.update(5 - progress_bar.n)
 
         arr_time_start, arr_time_end, diff = sample2time(array_sample_start = data_silence["start_sample"].values, 
                                                          array_sample_end = data_silence["end_sample"].values, 
@@ -71,9 +112,7 @@ def apply_energy_silences(signal, fs, window_ms=5,):
         data_silence = data_silence.reset_index(drop = True)
         data_silence["new_silences"] = [True] * len(data_silence)
         
-        pulse_detec = create_pulse(signal_ref = signal, 
-                                   array_sample_start = data_silence["start_sample"].values, 
-                                   array_sample_end = data_silence["end_sample"].values)
+        pulse_detec = IntervalSet.from_dataframe(data_silence, n_samples = len(signal), dtype = signal.dtype)
         # Update progress bar
         progress_bar.update(1)
 
@@ -88,3 +127,63 @@ def apply_energy_silences(signal, fs, window_ms=5,):
 
     
 
+def _run_stage(cache, key, features, stage, params, compute):
+    """
+    Result of a stage from the stage cache, the feature store or compute, with the key of the result.
+    """
+    if cache is not None:
+        return cache.run(key, stage, params, compute)
+    if features is not None:
+        return features.get((stage,) + tuple(params.values()), compute), key
+    return compute(), key
+
+def apply_energy_silences_stream(read_blocks, fs, window_ms=5, two_pass=True):
+    """
+    Streaming version of apply_energy_silences with bounded memory.
+
+    The signal is processed block by block and the moving-average state is carried across
+    block edges, so the memory used depends on the block size and not on the recording length.
+    The envelogram statistics are computed either in a first sweep over the blocks (two_pass=True,
+    same intervals as apply_energy_silences) or with a running estimator in a single sweep
+    (two_pass=False, approximate near the start of the recording).
+
+    Parameters:
+    - read_blocks (callable): Function without arguments that returns a new iterable over consecutive
+                              blocks of the normalized signal. It is called once per sweep.
+    - fs (float): The sampling frequency of the signal.
+    - window_ms (int): Size of the moving window for average energy calculation in milliseconds (default is 5 ms).
+    - two_pass (bool): Compute the envelogram statistics over the whole signal before detecting (default is True).
+
+    Yields:
+    - silence (dict): Row with the keys of the data_silence table of apply_energy_silences
+                      (start_sample, end_sample, start_time, end_time, diff_time, new_silences),
+                      yielded as soon as the silence closes.
+    """
+
+    try:
+        window_move = int(window_ms * 0.001 * fs)
+
+        def average_energy_blocks():
+            energy_blocks = (shannon_energy(signal = block) for block in read_blocks())
+            return stream_avr_energy(energy_blocks = energy_blocks, window_move = window_move)
+
+        if two_pass:
+            # Sweep 1: envelogram statistics
+            mean, standard_deviation = running_stats(average_energy_blocks())
+            envelogram_blocks = stream_envelogram(average_energy_blocks(), mean, standard_deviation)
+        else:
+            envelogram_blocks = stream_envelogram(average_energy_blocks())
+
+        # Sweep 2: detection of silences
+        for start, end in stream_silence_intervals(envelogram_blocks):
+            arr_time_start, arr_time_end, diff = sample2time(array_sample_start = [start],
+                                                             array_sample_end = [end],
+                                                             fs = fs)
+            if diff[0] >= 0.2:
+                yield {"start_sample": int(start), "end_sample": int(end),
+                       "start_time": arr_time_start[0], "end_time": arr_time_end[0],
+                       "diff_time": diff[0], "new_silences": True}
+
+    except Exception as e:
+        print(e)
+        raise Exception("Error in silence detection")
@@ -0,0 +1,262 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from fonoSemillIAS.Silence.activateEnergy import *
+from fonoSemillIAS.others.process_result import *
+from fonoSemillIAS.others.intervals import IntervalSet
+from fonoSemillIAS.preproc.othersFilters import DWT_filter, nrp_filter_chunked
+
+SOURCES = ["signal", "fs"]
+KINDS = ["full", "elementwise", "stream"]
+
+class Stage():
+    def __init__(self, name, func, inputs, kind="full", params=None):
+        """
+        Node of a Pipeline.
+
+        Args:
+        - name (str): Name of the output of the stage.
+        - func (callable): Function of the stage. "full" stages get the values of their inputs,
+          "elementwise" stages get one block of the first input (and the values of the other
+          inputs) and return the block of the output, "stream" stages get an iterable of blocks
+          of the first input (and the values of the other inputs) and yield blocks of the output.
+        - inputs (list): Names of the sources or stages used as positional arguments of func.
+        - kind (str): "full", "elementwise" or "stream".
+        - params (dict): Keyword arguments of func.
+        """
+        assert kind in KINDS, "kind not permited"
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.kind = kind
+        self.params = dict(params or {})
+
+    def __repr__(self):
+        return f"Stage({self.name}, kind={self.kind}, inputs={self.inputs}, params={self.params})"
+
+class Pipeline():
+    def __init__(self, block_size: int = 1 << 16) -> None:
+        """
+        Declarative pipeline: a DAG of stages evaluated lazily.
+
+        Only the stages needed by the requested outputs are run. Chains of elementwise and stream
+        stages whose intermediate outputs are not requested elsewhere are fused into one pass over
+        blocks of block_size samples, so only the last output of the chain is materialized.
+
+        Args:
+        - block_size (int): Number of samples per block of the fused passes. Default is 65536.
+        """
+        self.block_size = block_size
+        self.stages = OrderedDict()
+
+    def add(self, name, func, inputs=("signal",), kind="full", **params):
+        """
+        Declare a stage. Its inputs must be sources ("signal", "fs") or stages already declared.
+
+        Returns:
+        - Pipeline: self, to chain the declarations.
+        """
+        assert name not in self.stages and name not in SOURCES, f"{name} is already declared"
+        missing = [name_input for name_input in inputs if name_input not in self.stages and name_input not in SOURCES]
+        assert len(missing) == 0, f"Undeclared inputs: {missing}"
+        self.stages[name] = Stage(name, func, inputs, kind, params)
+        return self
+
+    def set_params(self, name, **params):
+        """
+        Change keyword arguments of a declared stage.
+        """
+        self.stages[name].params.update(params)
+        return self
+
+    def plan(self, outputs):
+        """
+        Groups of stages run to compute the outputs, in order. A group of several stages is a fused pass.
+        """
+        required = self._required(outputs)
+        consumers = {}
+        for stage in required:
+            for name_input in self.stages[stage].inputs:
+                consumers.setdefault(name_input, []).append(stage)
+
+        groups = []
+        for name, stage in self.stages.items():
+            if name not in required:
+                continue
+            previous = stage.inputs[0] if stage.inputs else None
+            group = next((group for group in groups if group[-1] == previous), None)
+            fusable = (group is not None and stage.kind != "full"
+                       and self.stages[previous].kind != "full"
+                       and previous not in outputs
+                       and consumers.get(previous, []) == [name])
+            if fusable:
+                group.append(name)
+            else:
+                groups.append([name])
+        return _order_groups(groups, self.stages)
+
+    def run(self, signal, fs, outputs):
+        """
+        Evaluate the pipeline on a signal.
+
+        Args:
+        - signal (array): The input signal (source "signal").
+        - fs (float): The sampling frequency of the signal (source "fs").
+        - outputs (list or str): Names of the stages to return.
+
+        Returns:
+        - dict: name -> value of each requested output (the value itself if outputs is a str).
+        """
+        single = isinstance(outputs, str)
+        outputs = [outputs] if single else list(outputs)
+        values = {"signal": signal, "fs": fs}
+        for group in self.plan(outputs):
+            head = self.stages[group[0]]
+            if len(group) == 1 and head.kind == "full":
+                values[head.name] = head.func(*[values[name] for name in head.inputs], **head.params)
+            else:
+                values[group[-1]] = self._run_fused(group, values)
+        if single:
+            return values[outputs[0]]
+        return {name: values[name] for name in outputs}
+
+    def _required(self, outputs):
+        required = set()
+        pending = list(outputs)
+        while pending:
+            name = pending.pop()
+            if name in SOURCES or name in required:
+                continue
+            assert name in self.stages, f"{name} is not declared"
+            required.add(name)
+            pending.extend(self.stages[name].inputs)
+        return required
+
+    def _run_fused(self, group, values):
+        """
+        One pass over blocks of the first input of the group through every stage of the group.
+        """
+        source = values[self.stages[group[0]].inputs[0]]
+        blocks = (source[start:start + self.block_size] for start in range(0, len(source), self.block_size))
+        for name in group:
+            stage = self.stages[name]
+            extra = [values[name_input] for name_input in stage.inputs[1:]]
+            if stage.kind == "elementwise":
+                blocks = _map_blocks(stage.func, blocks, extra, stage.params)
+            else:
+                blocks = stage.func(blocks, *extra, **stage.params)
+        blocks = list(blocks)
+        return np.concatenate(blocks) if blocks else np.zeros(0)
+
+def _order_groups(groups, stages):
+    """
+    Order the groups so every input of a group is computed before it runs.
+    """
+    ordered, available = [], set(SOURCES)
+    pending = list(groups)
+    while pending:
+        for group in pending:
+            inputs = {name_input for name in group for name_input in stages[name].inputs} - set(group)
+            if inputs <= available:
+                ordered.append(group)
+                available.update(group)
+                pending.remove(group)
+                break
+    return ordered
+
+def _map_blocks(func, blocks, extra, params):
+    for block in blocks:
+        yield func(block, *extra, **params)
+
+def peak(signal):
+    """
+    Normalization factor of Audio: maximum of the signal.
+    """
+    return np.max(signal)
+
+def normalize(block, peak):
+    return block / peak
+
+def window_samples(fs, window_ms):
+    return int(window_ms * 0.001 * fs)
+
+def dwt(signal, fs, wavelet="sym10", level=5, threshold_value=0.02, chunk_s=30, n_jobs=1):
+    chunk_size = None if chunk_s is None else int(chunk_s * fs)
+    signal_dwt, _ = DWT_filter(signal, wavelet=wavelet, level=level, threshold_value=threshold_value,
+                               return_coeffs=False, chunk_size=chunk_size, n_jobs=n_jobs)
+    return signal_dwt
+
+def silence_lobes(envelogram_wave):
+    """
+    Silence intervals of an envelogram (zero crossings, lobes and negative lobes).
+    """
+    zero_crossing = find_zero_crossings(envelogram = envelogram_wave)
+    lobe_indices = identify_lobes(envelogram = envelogram_wave, zero_crossings = zero_crossing)
+    return identify_silence(envelogram = envelogram_wave, lobe_indices = lobe_indices)
+
+def silence_table(intervals, fs, min_duration=0.2):
+    """
+    Silence table of apply_energy_silences from a list of (start_sample, end_sample).
+    """
+    data_silence = pd.DataFrame(intervals, columns = ["start_sample","end_sample"])
+    arr_time_start, arr_time_end, diff = sample2time(array_sample_start = data_silence["start_sample"].values,
+                                                     array_sample_end = data_silence["end_sample"].values,
+                                                     fs = fs)
+    data_silence["start_time"] = arr_time_start
+    data_silence["end_time"] = arr_time_end
+    data_silence["diff_time"] = diff
+    data_silence = data_silence[data_silence["diff_time"] >= min_duration]
+    data_silence = data_silence.reset_index(drop = True)
+    data_silence["new_silences"] = [True] * len(data_silence)
+    return data_silence
+
+def interval_set(data_silence, signal):
+    return IntervalSet.from_dataframe(data_silence, n_samples = len(signal), dtype = signal.dtype)
+
+def to_pulse(intervals):
+    return intervals.to_pulse()
+
+def energy_pipeline(preproc=False, normalization=True, window_ms=5, threshold_value=0.02, std_tresh=0.5,
+                    min_duration=0.2, block_size=1 << 16):
+    """
+    Pipeline of the energy silence detector (apply_preproc + apply_energy_silences) with its constants as parameters.
+
+    Stages: "peak", "normalized" (if normalization), "dwt", "nrp" (if preproc), "energy",
+    "average_energy", "envelogram", "intervals", "silences" (table), "interval_set" and "pulse".
+    Shannon energy and average energy (and the normalization, without preproc) run fused in one blocked pass, and the
+    dense "pulse" is only built when it is requested.
+
+    Parameters:
+    - preproc (bool): Apply the DWT and NRP filters first (default is False).
+    - normalization (bool): Divide the signal by its maximum before the filters, as Audio does (default is True).
+    - window_ms (int): Size of the moving window for average energy calculation in milliseconds (default is 5 ms).
+    - threshold_value (float): Threshold of the DWT filter (default is 0.02).
+    - std_tresh (float): Threshold of the NRP filter in standard deviations (default is 0.5).
+    - min_duration (float): Minimum duration of a silence in seconds (default is 0.2).
+    - block_size (int): Number of samples per block of the fused passes (default is 65536).
+
+    Returns:
+    - Pipeline: for example energy_pipeline().run(signal, fs, ["silences", "interval_set"]).
+    """
+    pipeline = Pipeline(block_size = block_size)
+    source = "signal"
+    # Audio normalizes the amplitude before apply_preproc: the filtered signal is not normalized again
+    if normalization:
+        pipeline.add("peak", peak, inputs = [source])
+        pipeline.add("normalized", normalize, inputs = [source, "peak"], kind = "elementwise")
+        source = "normalized"
+    if preproc:
+        pipeline.add("dwt", dwt, inputs = [source, "fs"], threshold_value = threshold_value)
+        pipeline.add("nrp", nrp_filter_chunked, inputs = ["dwt", "fs"], std_tresh = std_tresh)
+        source = "nrp"
+    pipeline.add("energy", shannon_energy, inputs = [source], kind = "elementwise")
+    pipeline.add("window_move", window_samples, inputs = ["fs"], window_ms = window_ms)
+    pipeline.add("average_energy", stream_avr_energy, inputs = ["energy", "window_move"], kind = "stream")
+    pipeline.add("envelogram", envelogram, inputs = ["average_energy"])
+    pipeline.add("intervals", silence_lobes, inputs = ["envelogram"])
+    pipeline.add("silences", silence_table, inputs = ["intervals", "fs"], min_duration = min_duration)
+    pipeline.add("interval_set", interval_set, inputs = ["silences", "signal"])
+    pipeline.add("pulse", to_pulse, inputs = ["interval_set"])
+    return pipeline
@@ -1,10 +1,11 @@
+import os
 from tqdm import tqdm
 
 from fonoSemillIAS.preproc.othersFilters import DWT_filter
-from fonoSemillIAS.preproc.othersFilters import nrp_filter
+from fonoSemillIAS.preproc.othersFilters import nrp_filter, nrp_filter_chunked
 from fonoSemillIAS.preproc.temporalFilters import median_filter
 
-def apply_preproc(signal, fs, torch):
+def apply_preproc(signal, fs, torch, chunk_s = None, n_jobs = 1, noise = "signal", cache = None):
   """
   Applies preprocessing to a signal.
 
@@ -12,6 +13,11 @@ def apply_preproc(signal, fs, torch):
   - signal (array): The input signal.
   - fs (float): The sampling frequency of the signal.
   - torch (bool): Indicates whether to use PyTorch's adaptive threshold for the filter.
+  - chunk_s (float): Length in seconds of the blocks of the DWT and NRP filters, for example 30. None filters the whole signal at once (default is None).
+  - n_jobs (int): Number of threads for the DWT blocks and processes for the NRP blocks when chunk_s is given. None uses all the CPUs (default is 1).
+  - noise (str or array): Noise profile of the NRP filter without torch, see nrp_filter_chunked (default is "signal").
+  - cache (StageCache): On-disk stage cache. The DWT and NRP outputs are stored there keyed by the signal and
+                        the filter parameters, and reused by later runs (default is None).
 
   Returns:
   - signal_pb (array): The processed signal after applying preprocessing.
@@ -24,16 +30,35 @@ def apply_preproc(signal, fs, torch):
     progress_bar = tqdm(total=2, desc='Progress', position=0)
     # 1. DWT filter
     tqdm.write("Start step 1: DWT filter")
-    signal_dwt, _ = DWT_filter(signal, wavelet="sym10", level=5, threshold_value=0.02)
+    chunk_size = None if chunk_s is None else int(chunk_s * fs)
+    def dwt():
+      signal_dwt, _ = DWT_filter(signal, wavelet="sym10", level=5, threshold_value=0.02, return_coeffs=False,
+                                 chunk_size=chunk_size, n_jobs=n_jobs or os.cpu_count())
+      return signal_dwt
+    if cache is None:
+      signal_dwt = dwt()
+    else:
+      signal_dwt, key = cache.run(cache.content_key(signal), "DWT_filter",
+                                  {"wavelet": "sym10", "level": 5, "threshold_value": 0.02, "chunk_s": chunk_s}, dwt)
     # Update progress bar
     progress_bar.update(1)
 
     # 2. Applying non-redundant noise reduction filter (NRP) to the DWT signal
     tqdm.write("Start step 2: Applying NRP filter")
-    if torch:
-        signal_pb = nrp_filter(signal=signal_dwt, std_tresh=4.5, fs=fs, torch=True)
+    def nrp():
+      if torch:
+        return nrp_filter(signal=signal_dwt, std_tresh=4.5, fs=fs, torch=True)
+      elif chunk_s is None:
+        return nrp_filter(signal=signal_dwt, std_tresh=0.5, fs=fs, torch=False)
+      else:
+        return nrp_filter_chunked(signal=signal_dwt, std_tresh=0.5, fs=fs, chunk_s=chunk_s,
+                                  noise=noise, n_jobs=n_jobs)
+    if cache is None:
+      signal_pb = nrp()
     else:
-        signal_pb = nrp_filter(signal=signal_dwt, std_tresh=0.5, fs=fs, torch=False)
+      noise_key = noise if isinstance(noise, str) else cache.content_key(noise)
+      signal_pb, _ = cache.run(key, "nrp_filter", {"fs": fs, "torch": torch, "std_tresh": 4.5 if torch else 0.5,
+                                                   "chunk_s": chunk_s, "noise": noise_key}, nrp)
     # Update progress bar
     progress_bar.update(1)
 
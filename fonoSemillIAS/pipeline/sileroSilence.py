@@ -2,6 +2,7 @@ import pandas as pd
 from tqdm import tqdm
 
 from fonoSemillIAS.others.process_result import *
+from fonoSemillIAS.others.intervals import IntervalSet
 
 def apply_silero_silences(SVAD, filename, wav):
     try:
@@ -9,39 +10,23 @@ def apply_silero_silences(SVAD, filename, wav):
         progress_bar = tqdm(total=2, desc='Progress', position=0)
 
         tqdm.write("Start step 1: Apply SVAD")
-        speech_timestamps = SVAD.apply(file_name = filename)
+        # The decoded signal is already in memory: no need to read the file again
+        speech_timestamps = SVAD.apply_array(waveform = wav.get_pcm(), fs = wav.fs)
         progress_bar.update(1)
 
         # Transform results
         tqdm.write("Start step 2: Transform data")
-        st = []
-        for value in speech_timestamps:
-            start = int( value["start"] * (wav.fs / SVAD.fs))
-            end = int( value["end"] * (wav.fs / SVAD.fs))
+        factor = wav.fs / SVAD.fs
+        df = pd.DataFrame({
+            "start_sample": np.array([value["start"] * factor for value in speech_timestamps], dtype=float).astype(int),
+            "end_sample": np.array([value["end"] * factor for value in speech_timestamps], dtype=float).astype(int),
+            })
 
-            st.append([start, end])
+        gap_start, gap_end = segments2gaps(array_start = df["start_sample"].values,
+                                           array_end = df["end_sample"].values,
+                                           end_value = wav.n_samples)
 
-        df = pd.DataFrame(st, columns = ["start_sample","end_sample"])
-
-        st = []
-
-        for i in range(len(df)-1):
-            start = int(df.iloc[i]["start_sample"])
-            end = int(df.iloc[i]["end_sample"])
-
-            start_b = int(df.iloc[i+1]["start_sample"])
-            end_b = int(df.iloc[i+1]["end_sample"])
-
-            if i == 0:
-                st.append([0, start])
-                st.append([end, start_b])
-            elif i == len(df) - 2:
-                st.append([end, start_b])
-                st.append([end_b, len(wav.amplitude)])
-            else:
-                st.append([end, start_b])
-
-        data_silence = pd.DataFrame(st, columns = ["start_sample","end_sample"])
+        data_silence = pd.DataFrame({"start_sample": gap_start, "end_sample": gap_end})
         arr_time_start, arr_time_end, diff = sample2time(array_sample_start = data_silence["start_sample"].values, 
                                                          array_sample_end = data_silence["end_sample"].values, 
                                                          fs = wav.fs)
@@ -53,9 +38,7 @@ def apply_silero_silences(SVAD, filename, wav):
         data_silence = data_silence.reset_index(drop = True)
         data_silence["new_silences"] = [True] * len(data_silence)
 
-        pulse_detec = create_pulse(signal_ref = wav.amplitude, 
-                                   array_sample_start = data_silence["start_sample"].values, 
-                                   array_sample_end = data_silence["end_sample"].values)
+        pulse_detec = IntervalSet.from_dataframe(data_silence, n_samples = wav.n_samples, dtype = np.float64)
 
         progress_bar.update(1)
         # Close progress bar
@@ -65,4 +48,63 @@ def apply_silero_silences(SVAD, filename, wav):
 
     except Exception as e:
         print(e)
-        raise Exception("Error in silence detection")
\ No newline at end of file
+        raise Exception("Error in silence detection")
+
+def stream_silero_silences(VADS, blocks, fs):
+    """
+    Streaming version of apply_silero_silences.
+
+    Args:
+    - VADS (VADStream): Streaming detector.
+    - blocks (iterable of arrays): Consecutive blocks of the signal at fs. They are resampled to the
+                                   rate of the model with a StreamResampler, as one signal.
+    - fs (float): The sampling frequency of the signal.
+
+    Yields:
+    - silence (dict): Row of the data_silence table (start_sample, end_sample, start_time, end_time,
+                      diff_time, new_silences) at fs, as soon as the speech segment after it is reported.
+    """
+    # silero_vad imports torch: only needed here, where a VADStream already exists
+    from fonoSemillIAS.Silence.silero_vad import StreamResampler
+    try:
+        factor = fs / VADS.fs
+        n_samples = [0]
+        resampler = StreamResampler(fs, VADS.fs)
+
+        def resampled():
+            for block in blocks:
+                n_samples[0] += len(block)
+                yield resampler(block)
+            yield resampler.flush()
+
+        gap_start = 0
+        in_speech = False
+        for event in VADS(resampled()):
+            if "start" in event:
+                in_speech = True
+                row = _silence_row(gap_start, int(event["start"] * factor), fs)
+                if row is not None:
+                    yield row
+            else:
+                in_speech = False
+                gap_start = min(int(event["end"] * factor), n_samples[0])
+
+        # Trailing silence
+        if not in_speech:
+            row = _silence_row(gap_start, n_samples[0], fs)
+            if row is not None:
+                yield row
+
+    except Exception as e:
+        print(e)
+        raise Exception("Error in silence detection")
+
+def _silence_row(start, end, fs):
+    arr_time_start, arr_time_end, diff = sample2time(array_sample_start = [start],
+                                                     array_sample_end = [end],
+                                                     fs = fs)
+    if diff[0] < 0.2:
+        return None
+    return {"start_sample": start, "end_sample": end,
+            "start_time": arr_time_start[0], "end_time": arr_time_end[0],
+            "diff_time": diff[0], "new_silences": True}
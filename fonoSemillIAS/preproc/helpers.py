@@ -1,4 +1,4 @@
-from scipy.fft import rfft, rfftfreq # Fast Fourier Transform
+from scipy.fft import rfft, irfft, rfftfreq, next_fast_len # Fast Fourier Transform
 from scipy.signal import sosfreqz
 import numpy as np
 import matplotlib.pyplot as plt
@@ -40,6 +40,9 @@ def get_fundamental_frequency(signal, fs):
   """
   Calculate the fundamental frequency of a voice signal.
 
+  The autocorrelation is computed with the FFT in O(N log N). For an F0 contour with a voicing
+  flag use fonoSemillIAS.preproc.pitch.pitch_track.
+
   Args:
   - signal (np.array): The voice signal.
   - fs (int): The sampling frequency of the signal.
@@ -47,12 +50,11 @@ def get_fundamental_frequency(signal, fs):
   Returns:
   - float: The estimated fundamental frequency.
   """
-  # Calculate the autocorrelation of the signal
-  autocorr = np.correlate(signal, signal, mode='full')
-
-  # Find the first maximum after the first minimum (remove DC)
-  first_min_index = np.argmax(autocorr)
-  autocorr = autocorr[first_min_index:]
+  # Calculate the autocorrelation of the signal for the lags 0 to N - 1
+  # (zero padding to 2N avoids the circular wrap of the FFT)
+  signal = np.asarray(signal, dtype=np.float64)
+  n_fft = next_fast_len(2 * len(signal))
+  autocorr = irfft(np.abs(rfft(signal, n=n_fft)) ** 2, n=n_fft)[:len(signal)]
 
   # Find the second maximum (fundamental frequency) after the first maximum
   fundamental_index = np.argmax(autocorr[1:]) + 1
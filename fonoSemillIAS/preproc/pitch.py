@@ -0,0 +1,175 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft, irfft, next_fast_len
+
+from fonoSemillIAS.audio.Audio import Audio
+
+def frame_view(signal:np.array, frame_length:int, hop_length:int):
+  """
+  Strided view of the frames of a signal, without copying it.
+
+  Args:
+  - signal (np.array): The input signal.
+  - frame_length (int): Number of samples per frame.
+  - hop_length (int): Number of samples between the starts of consecutive frames.
+
+  Returns:
+  - np.array: Read-only array (n_frames, frame_length); frame i starts at sample i * hop_length.
+  """
+  signal = np.asarray(signal)
+  if len(signal) < frame_length:
+    return np.empty((0, frame_length), dtype=signal.dtype)
+  return sliding_window_view(signal, frame_length)[::hop_length]
+
+def pitch_track(signal:np.array, fs:int, fmin:float = 60, fmax:float = 500, hop_ms:float = 10,
+                method:str = "yin", threshold:float = None, block_frames:int = 2048):
+  """
+  Framewise fundamental frequency (F0) contour of a voice signal
+  --------------------------------------------------
+  Each frame covers two periods of fmin. The autocorrelations of all the frames are computed
+  with the FFT, block_frames frames at a time, so the cost is O(N log frame) instead of the
+  O(N^2) of an autocorrelation of the whole signal.
+
+  Args:
+  - signal (np.array): The voice signal.
+  - fs (int): The sampling frequency of the signal.
+  - fmin (float): Lowest F0 searched in Hz. Default is 60.
+  - fmax (float): Highest F0 searched in Hz. Default is 500.
+  - hop_ms (float): Time between consecutive frames in milliseconds. Default is 10.
+  - method (str): "yin" (cumulative mean normalized difference) or "acf" (normalized cross-correlation). Default is "yin".
+  - threshold (float): Voicing threshold. For "yin" the maximum normalized difference of the period
+                       (default 0.15), for "acf" the minimum normalized cross-correlation (default 0.5).
+  - block_frames (int): Number of frames processed at once, bounds the memory. Default is 2048.
+
+  Returns:
+  - times (np.array): Time in seconds of the center of each frame.
+  - f0 (np.array): F0 of each frame in Hz, NaN in the unvoiced frames.
+  - voiced (np.array): Boolean voicing flag of each frame.
+  """
+  assert method in ["yin", "acf"], "method not permited"
+  assert 0 < fmin < fmax, "fmin must be positive and lower than fmax"
+  if threshold is None:
+    threshold = 0.15 if method == "yin" else 0.5
+
+  tau_min = max(1, int(np.floor(fs / fmax)))
+  tau_max = int(np.ceil(fs / fmin))
+  # The integration window of YIN covers one period of fmin, the frame adds the lags
+  window = tau_max
+  frame_length = window + tau_max + 1
+  hop_length = max(1, int(round(hop_ms * fs / 1000)))
+
+  frames = frame_view(np.asarray(signal, dtype=np.float64), frame_length, hop_length)
+  n_frames = len(frames)
+  times = (np.arange(n_frames) * hop_length + frame_length / 2) / fs
+  periods = np.full(n_frames, np.nan)
+  for start in range(0, n_frames, block_frames):
+    block = frames[start:start + block_frames]
+    if method == "yin":
+      periods[start:start + len(block)] = _yin_periods(block, window, tau_min, tau_max, threshold)
+    else:
+      periods[start:start + len(block)] = _acf_periods(block, window, tau_min, tau_max, threshold)
+
+  voiced = ~np.isnan(periods)
+  f0 = fs / periods
+  return times, f0, voiced
+
+def pitch_track_batch(files:list, n_jobs:int = 1, **kwargs):
+  """
+  F0 contours of many audio files, optionally across a process pool.
+
+  Args:
+  - files (list): Paths of the .wav files.
+  - n_jobs (int): Number of worker processes. 1 runs in the current process, None uses all the CPUs. Default is 1.
+  - **kwargs: Arguments of pitch_track (fmin, fmax, hop_ms, method, threshold, block_frames).
+
+  Returns:
+  - dict: path -> (times, f0, voiced), as returned by pitch_track.
+  """
+  kwargs_list = [kwargs] * len(files)
+  try:
+    if n_jobs == 1:
+      return dict(zip(files, map(_pitch_track_file, files, kwargs_list)))
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+      return dict(zip(files, executor.map(_pitch_track_file, files, kwargs_list)))
+  except Exception as e:
+    print(e)
+    raise Exception("Error in pitch tracking")
+
+def _pitch_track_file(file_path, kwargs):
+  wav = Audio(file_path, lazy=True)
+  return pitch_track(wav.amplitude, wav.fs, **kwargs)
+
+def _lag_products(block, window, tau_max):
+  """
+  r[:, tau] = sum_j x[j] * x[j + tau] over the first `window` samples of each frame, for tau in [0, tau_max].
+  """
+  n_fft = next_fast_len(block.shape[1] + window)
+  spectrum = rfft(block, n=n_fft, axis=1)
+  head = rfft(block[:, :window], n=n_fft, axis=1)
+  return irfft(np.conj(head) * spectrum, n=n_fft, axis=1)[:, :tau_max + 1]
+
+def _yin_periods(block, window, tau_min, tau_max, threshold):
+  """
+  Period in samples of each frame with YIN, NaN where no lag is below the threshold.
+  """
+  r = _lag_products(block, window, tau_max)
+  shifted = _shifted_energy(block, window, tau_max)
+  difference = shifted[:, [0]] + shifted - 2 * r
+  difference[:, 0] = 0
+
+  # Cumulative mean normalized difference
+  cumulative = np.cumsum(difference[:, 1:], axis=1)
+  cmnd = np.ones_like(difference)
+  lags = np.arange(1, tau_max + 1)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    cmnd[:, 1:] = np.where(cumulative > 0, difference[:, 1:] * lags / cumulative, 1)
+
+  # First local minimum below the threshold in [tau_min, tau_max)
+  inner = cmnd[:, tau_min:tau_max]
+  trough = (inner <= cmnd[:, tau_min - 1:tau_max - 1]) & (inner < cmnd[:, tau_min + 1:tau_max + 1])
+  candidates = trough & (inner < threshold)
+  has_candidate = candidates.any(axis=1)
+  tau = np.argmax(candidates, axis=1) + tau_min
+  return _refine(cmnd, tau, has_candidate)
+
+def _acf_periods(block, window, tau_min, tau_max, threshold, octave_ratio = 0.9):
+  """
+  Period in samples of each frame with the normalized cross-correlation, NaN where the peak is below the threshold.
+
+  The multiples of the period have peaks as high as the period itself, so the first local maximum
+  above octave_ratio times the highest peak is taken instead of the highest one.
+  """
+  r = _lag_products(block, window, tau_max)
+  shifted = _shifted_energy(block, window, tau_max)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    norm = np.sqrt(shifted[:, [0]] * shifted)
+    acf = np.where(norm > 0, r / norm, 0)
+
+  inner = acf[:, tau_min:tau_max]
+  peaks = (inner >= acf[:, tau_min - 1:tau_max - 1]) & (inner > acf[:, tau_min + 1:tau_max + 1])
+  highest = np.max(np.where(peaks, inner, -np.inf), axis=1, keepdims=True)
+  candidates = peaks & (inner >= octave_ratio * highest)
+  tau = np.argmax(candidates, axis=1) + tau_min
+  valid = candidates.any(axis=1) & (acf[np.arange(len(acf)), tau] >= threshold)
+  # The parabola is fitted to -acf so the refinement looks for a minimum
+  return _refine(-acf, tau, valid)
+
+def _shifted_energy(block, window, tau_max):
+  """
+  Energy of the `window` samples starting at tau of each frame, for tau in [0, tau_max].
+  """
+  energy = np.cumsum(np.square(block), axis=1)
+  energy = np.concatenate([np.zeros((len(block), 1)), energy], axis=1)
+  return energy[:, window:window + tau_max + 1] - energy[:, :tau_max + 1]
+
+def _refine(curve, tau, valid):
+  """
+  Parabolic interpolation of the minimum of curve around tau, NaN where not valid.
+  """
+  rows = np.arange(len(curve))
+  left, center, right = curve[rows, tau - 1], curve[rows, tau], curve[rows, tau + 1]
+  denominator = left - 2 * center + right
+  with np.errstate(divide="ignore", invalid="ignore"):
+    shift = np.where(denominator > 0, 0.5 * (left - right) / denominator, 0)
+  return np.where(valid, tau + np.clip(shift, -1, 1), np.nan)
@@ -1,10 +1,28 @@
 import numpy as np
+from functools import lru_cache
 from scipy.signal import butter, sosfilt
 from scipy.signal import wiener
 
 
 from fonoSemillIAS.preproc.helpers import plot_filter_response
 
+@lru_cache(maxsize=128)
+def design_filter(order: int, cutoff, filter_type: str, fs: int, output: str = "sos"):
+    """
+    Butterworth design, cached by (order, cutoff, type, fs, output)
+
+    Args:
+    - order (int): Order of the filter
+    - cutoff (float or tuple): Cutoff frequency, or (low, high) for band filters
+    - filter_type (str): 'bandpass', 'highpass', 'lowpass' or 'bandstop'
+    - fs (int): Sampling frequency of the signal
+    - output (str): Output of butter. Default is "sos"
+
+    Returns:
+    - np.array: Design, shared between calls (do not modify it)
+    """
+    return butter(order, list(cutoff) if isinstance(cutoff, tuple) else cutoff, filter_type, fs=fs, output=output)
+
 def band_pass_filter(signal: np.array, fs: int ,low_cutoff_freq: int, high_cutoff_freq: int, order:int = 20,output:str = "sos", plot=False):
     """
     Applies a band-pass filter to a given signal
@@ -19,7 +37,7 @@ def band_pass_filter(signal: np.array, fs: int ,low_cutoff_freq: int, high_cutof
     Returns:
     - np.array: Filtered signal
     """
-    sos = butter(order, [low_cutoff_freq, high_cutoff_freq], 'bandpass', fs=fs, output=output)
+    sos = design_filter(order, (low_cutoff_freq, high_cutoff_freq), 'bandpass', fs, output)
     filtered_signal = sosfilt(sos, signal)
     
     window_size = 3
@@ -44,7 +62,7 @@ def high_pass_filter(signal: np.array, fs: int, cutoff_freq: int, plot=False):
     Returns:
     - np.array: Filtered signal
     """
-    sos = butter(20, cutoff_freq, 'highpass', fs=fs, output="sos")
+    sos = design_filter(20, cutoff_freq, 'highpass', fs)
     filtered_signal = sosfilt(sos, signal)
     
     if plot:
@@ -65,7 +83,7 @@ def low_pass_filter(signal: np.array, fs: int, cutoff_freq: int, plot=False):
     Returns:
     - np.array: Filtered signal
     """
-    sos = butter(20, cutoff_freq, 'lowpass', fs=fs, output="sos")
+    sos = design_filter(20, cutoff_freq, 'lowpass', fs)
     filtered_signal = sosfilt(sos, signal)
 
     if plot:
@@ -87,7 +105,7 @@ def band_stop_filter(signal: np.array, fs: int, low_cutoff_freq: int, high_cutof
     Returns:
     - np.array: Filtered signal
     """
-    sos = butter(20, [low_cutoff_freq, high_cutoff_freq], 'bandstop', fs=fs, output="sos")
+    sos = design_filter(20, (low_cutoff_freq, high_cutoff_freq), 'bandstop', fs)
     filtered_signal = sosfilt(sos, signal)
     
     if plot:
@@ -106,4 +124,118 @@ def adaptive_filter(signal: np.array) -> np.array:
     - np.array: Filtered signal
     """
     filtered_signal = wiener(signal)
-    return filtered_signal
\ No newline at end of file
+    return filtered_signal
+
+class FilterBank():
+    def __init__(self, fs: int, stages: list):
+        """
+        Cascade of filters applied block by block
+
+        The IIR stages carry their sosfilt state (zi) and the smoothing stages their last samples
+        between blocks, so the concatenated output equals filtering the whole signal at once
+        (band_pass_filter, high_pass_filter, ...), with constant memory. The designs come from
+        the design_filter cache.
+
+        Args:
+        - fs (int): Sampling frequency of the signal
+        - stages (list): Stages in order, each one of
+            ("bandpass", (low, high), order), ("bandstop", (low, high), order),
+            ("highpass", cutoff, order), ("lowpass", cutoff, order) or
+            ("smooth", window_size) for the moving average of band_pass_filter.
+          E.g. band_pass_filter is [("bandpass", (low, high), 20), ("smooth", 3)]
+        """
+        self.fs = fs
+        self.stages = []
+        for stage in stages:
+            if stage[0] == "smooth":
+                self.stages.append(_SmoothStage(stage[1]))
+            else:
+                assert stage[0] in ["bandpass", "bandstop", "highpass", "lowpass"], "filter type not permited"
+                cutoff = tuple(stage[1]) if isinstance(stage[1], (list, tuple)) else stage[1]
+                self.stages.append(_SOSStage(design_filter(stage[2], cutoff, stage[0], fs)))
+
+    def reset(self):
+        """
+        Reset the state of every stage, to start a new signal
+        """
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, block: np.array) -> np.array:
+        """
+        Filter the next block of the signal
+
+        Returns:
+        - np.array: Next block of output. The smoothing stages delay the output by
+          (window_size - 1) // 2 samples, which flush returns at the end.
+        """
+        for stage in self.stages:
+            block = stage.process(block)
+        return block
+
+    def flush(self) -> np.array:
+        """
+        Last samples of the output, after the whole signal has been processed
+        """
+        block = np.zeros(0)
+        for stage in self.stages:
+            block = np.concatenate([stage.process(block), stage.flush()])
+        return block
+
+    def __call__(self, blocks):
+        """
+        Filter a stream of blocks, yielding the output blocks
+        """
+        self.reset()
+        for block in blocks:
+            yield self.process(block)
+        yield self.flush()
+
+    def filter(self, signal: np.array, block_size: int = 1 << 16) -> np.array:
+        """
+        Filter a whole signal block by block
+        """
+        blocks = (signal[start:start + block_size] for start in range(0, len(signal), block_size))
+        return np.concatenate(list(self(blocks)))
+
+class _SOSStage():
+    def __init__(self, sos):
+        self.sos = sos
+        self.reset()
+
+    def reset(self):
+        self.zi = np.zeros((self.sos.shape[0], 2))
+
+    def process(self, block):
+        if len(block) == 0:
+            return np.zeros(0)
+        filtered, self.zi = sosfilt(self.sos, block, zi=self.zi)
+        return filtered
+
+    def flush(self):
+        return np.zeros(0)
+
+class _SmoothStage():
+    def __init__(self, window_size):
+        self.window = np.ones(window_size) / window_size
+        # Output sample n of np.convolve(mode='same') is sample n + delay of the full convolution
+        self.delay = (window_size - 1) // 2
+        self.reset()
+
+    def reset(self):
+        self.tail = np.zeros(len(self.window) - 1)
+        self.skip = self.delay
+
+    def process(self, block):
+        if len(block) == 0:
+            return np.zeros(0)
+        extended = np.concatenate([self.tail, block])
+        self.tail = extended[len(extended) - (len(self.window) - 1):]
+        full = np.convolve(extended, self.window, mode='valid')
+        skip = min(self.skip, len(full))
+        self.skip -= skip
+        return full[skip:]
+
+    def flush(self):
+        # Remaining samples of the 'same' output, with zeros after the end of the signal
+        return self.process(np.zeros(self.delay))
@@ -0,0 +1,99 @@
+"""
+run_batch over small WAV files: per-file failures and dead workers are reported without stopping
+the batch, and the silence tables of every file end up in the output.
+"""
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.io import wavfile
+
+from fonoSemillIAS.pipeline import batch
+
+FS = 16000
+
+
+def write_wavs(directory, n_files, rng):
+    files = []
+    for k in range(n_files):
+        signal = rng.normal(size=2 * FS) * (np.arange(2 * FS) // 6000 % 2) * 8000
+        path = os.path.join(directory, f"audio_{k}.wav")
+        wavfile.write(path, FS, signal.astype(np.int16))
+        files.append(path)
+    return files
+
+
+def read_output(output_path):
+    return pd.read_parquet(output_path) if output_path.endswith(".parquet") else pd.read_csv(output_path)
+
+
+PROCESS_FILE = batch._process_file
+
+
+def process_or_crash(file):
+    if "crash" in file:
+        # A dead worker, as a segfault or the OOM killer would leave it
+        os._exit(1)
+    return PROCESS_FILE(file)
+
+
+def test_missing_file_is_reported(tmp_path):
+    files = write_wavs(str(tmp_path), 3, np.random.default_rng(0))
+    files.insert(1, str(tmp_path / "missing.wav"))
+    report, output_path = batch.run_batch(files, output_path=str(tmp_path / "silences.parquet"), n_jobs=2)
+
+    assert report["status"].tolist() == ["ok", "failed", "ok", "ok"]
+    assert report["attempts"].tolist() == [1, 2, 1, 1]
+    assert "FileNotFoundError" in report["error"][1]
+    assert sorted(read_output(output_path)["file"].unique()) == sorted(files[:1] + files[2:])
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="the patched _process_file only reaches forked workers")
+def test_dead_worker_does_not_stop_the_batch(tmp_path, monkeypatch):
+    files = write_wavs(str(tmp_path), 4, np.random.default_rng(0))
+    crash = str(tmp_path / "crash.wav")
+    wavfile.write(crash, FS, np.zeros(100, np.int16))
+    monkeypatch.setattr(batch, "_process_file", process_or_crash)
+
+    report, output_path = batch.run_batch([crash] + files, output_path=str(tmp_path / "silences.parquet"),
+                                          n_jobs=1, max_in_flight=1, retries=1)
+
+    assert report["status"].tolist() == ["failed"] + ["ok"] * len(files)
+    assert report["attempts"][0] == 2
+    assert "BrokenProcessPool" in report["error"][0]
+    assert sorted(read_output(output_path)["file"].unique()) == sorted(files)
+
+
+def silence_table(file, starts, dtype):
+    starts = np.asarray(starts, dtype=dtype)
+    return pd.DataFrame({"file": [file] * len(starts), "detector": ["energy"] * len(starts),
+                         "start_sample": starts, "end_sample": starts + 4000,
+                         "start_time": starts / FS, "end_time": (starts + 4000) / FS,
+                         "diff_time": np.full(len(starts), 4000 / FS)})
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".csv"])
+def test_write_table_empty_first(tmp_path, extension):
+    if extension == ".parquet":
+        pytest.importorskip("pyarrow")
+    output_path = str(tmp_path / f"silences{extension}")
+    # A file without silences first (object columns), then integer and float samples
+    tables = [pd.DataFrame(columns=list(batch.COLUMNS)), silence_table("a.wav", [0, 16000], int),
+              silence_table("b.wav", [8000.0], float)]
+    writer = None
+    for table in tables:
+        writer = batch._write_table(writer, output_path, table)
+    if writer is not None:
+        writer.close()
+
+    output = read_output(output_path)
+    assert output["file"].tolist() == ["a.wav", "a.wav", "b.wav"]
+    assert output["start_sample"].tolist() == [0, 16000, 8000]
+    assert output["start_sample"].dtype == np.int64
+    assert output["diff_time"].dtype == np.float64
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+        assert pq.read_schema(output_path).equals(batch.SCHEMA)
@@ -0,0 +1,33 @@
+"""
+DWT_filter_chunked must reproduce DWT_filter (first len(signal) samples) on non-stationary
+signals, where the maxima of the padded blocks differ from the maxima of the whole transform.
+"""
+import numpy as np
+import pytest
+
+from fonoSemillIAS.preproc.othersFilters import DWT_filter
+
+FS = 16000
+
+
+def non_stationary(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    envelope = (np.sin(2 * np.pi * 0.7 * t / FS) > 0) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t / FS)) ** 2
+    signal = 2 * np.sin(2 * np.pi * 150 * t / FS + 3 * np.sin(2 * np.pi * 2 * t / FS)) * envelope
+    signal += 0.01 * rng.normal(size=n)
+    # A transient right after a block boundary, inside the pad of the previous block
+    signal[n // 3:n // 3 + 50] += 1.5
+    return signal
+
+
+@pytest.mark.parametrize("n", [1000, 99999, 300001])
+@pytest.mark.parametrize("wavelet, level, threshold_value", [("sym10", 5, 0.02), ("db6", 5, 0.1), ("db4", 3, 0.3)])
+@pytest.mark.parametrize("chunk_size", [4096, 100000])
+def test_chunked_equals_whole_signal(n, wavelet, level, threshold_value, chunk_size):
+    signal = non_stationary(n)
+    expected, _ = DWT_filter(signal, wavelet, level, threshold_value, return_coeffs=False)
+    chunked, _ = DWT_filter(signal, wavelet, level, threshold_value, return_coeffs=False,
+                            chunk_size=chunk_size, n_jobs=2)
+    assert len(chunked) == n
+    np.testing.assert_allclose(chunked, expected[:n], rtol=0, atol=1e-12)
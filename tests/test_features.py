@@ -0,0 +1,46 @@
+"""
+FeatureStore: LRU cap and spill, and the energy stages of apply_energy_silences sharing it.
+"""
+import numpy as np
+
+from fonoSemillIAS.audio.features import FeatureStore
+from fonoSemillIAS.pipeline.energySilence import apply_energy_silences
+
+FS = 16000
+
+
+def bursts(seed, period):
+    rng = np.random.default_rng(seed)
+    signal = rng.normal(size=3 * FS) * (np.arange(3 * FS) // period % 2)
+    return signal / np.max(signal)
+
+
+def test_lru_cap_and_spill(tmp_path):
+    store = FeatureStore(np.zeros(10), FS, max_bytes=2 * 800, spill_dir=str(tmp_path))
+    for k in range(3):
+        store.get(("feature", k), lambda: np.full(100, k, dtype=np.float64))
+    assert store.stats()["in_memory"] == 2 and store.stats()["spills"] == 1
+    # The evicted feature is reloaded from disk, not computed again
+    assert np.all(store.get(("feature", 0), lambda: None) == 0)
+    assert store.stats()["misses"] == 3
+
+
+def test_holds():
+    signal = bursts(0, 8000)
+    store = FeatureStore(signal, FS)
+    assert store.holds(signal) and store.holds(signal[:])
+    assert not store.holds(signal.copy()) and not store.holds(signal[1:])
+
+
+def test_energy_stages_use_only_their_own_signal():
+    first, second = bursts(0, 8000), bursts(1, 5000)
+    store = FeatureStore(first, FS)
+    expected_first, _ = apply_energy_silences(first, FS)
+    expected_second, _ = apply_energy_silences(second, FS)
+
+    assert apply_energy_silences(first, FS, features=store)[0].equals(expected_first)
+    assert store.stats()["misses"] == 2
+    # Another signal with the same store: computed without it
+    assert apply_energy_silences(second, FS, features=store)[0].equals(expected_second)
+    assert apply_energy_silences(first, FS, features=store)[0].equals(expected_first)
+    assert store.stats()["misses"] == 2 and store.stats()["hits"] == 2
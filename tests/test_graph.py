@@ -0,0 +1,62 @@
+"""
+energy_pipeline against apply_preproc + apply_energy_silences, the fusion of its stages and the
+lazy evaluation of its outputs.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from fonoSemillIAS.pipeline.energySilence import apply_energy_silences
+from fonoSemillIAS.pipeline.graph import energy_pipeline
+from fonoSemillIAS.pipeline.preproc import apply_preproc
+from test_nrp_chunked import speech_like
+
+FS = 16000
+
+
+@pytest.fixture(scope="module")
+def signal():
+    # Not normalized, as the samples before Audio divides them by their maximum
+    return 0.6 * speech_like(FS, 8, seed=3)
+
+
+@pytest.mark.parametrize("block_size", [1 << 16, 1000])
+def test_matches_apply_energy_silences(signal, block_size):
+    outputs = energy_pipeline(block_size = block_size).run(signal, FS, ["silences", "interval_set"])
+    expected, expected_set = apply_energy_silences(signal / np.max(signal), FS)
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(outputs["silences"], expected)
+    assert np.array_equal(np.asarray(outputs["interval_set"]), np.asarray(expected_set))
+
+
+def test_matches_apply_preproc_and_apply_energy_silences(signal):
+    silences = energy_pipeline(preproc = True).run(signal, FS, "silences")
+    # The graph filters with the chunked DWT and NRP of apply_preproc (30 s blocks)
+    filtered = apply_preproc(signal / np.max(signal), FS, torch = False, chunk_s = 30, n_jobs = 1)
+    expected, _ = apply_energy_silences(filtered, FS)
+    pd.testing.assert_frame_equal(silences, expected)
+
+
+def test_plan_fuses_the_blockwise_chain():
+    pipeline = energy_pipeline()
+    plan = pipeline.plan(["silences"])
+    assert ["normalized", "energy", "average_energy"] in plan
+    assert [name for group in plan for name in group if name in ["interval_set", "pulse"]] == []
+    # A requested intermediate output is materialized: the chain is split after it
+    plan = pipeline.plan(["energy", "silences"])
+    assert ["normalized", "energy"] in plan and ["average_energy"] in plan
+    # The stages before a full stage are not fused with it
+    assert ["peak"] in energy_pipeline(preproc = True).plan(["silences"])
+    assert ["normalized"] in energy_pipeline(preproc = True).plan(["silences"])
+
+
+def test_pulse_is_only_built_when_requested(signal):
+    pipeline = energy_pipeline()
+    calls = []
+    to_pulse = pipeline.stages["pulse"].func
+    pipeline.stages["pulse"].func = lambda intervals: calls.append(1) or to_pulse(intervals)
+    interval_set = pipeline.run(signal, FS, "interval_set")
+    assert calls == []
+    pulse = pipeline.run(signal, FS, "pulse")
+    assert calls == [1]
+    assert np.array_equal(pulse, interval_set.to_pulse())
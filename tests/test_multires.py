@@ -0,0 +1,45 @@
+"""
+detect_silences_multires against detect_silences, on the raw intervals (before the 0.2 s filter).
+"""
+import numpy as np
+import pytest
+
+from fonoSemillIAS.Silence.activateEnergy import (avr_energy, detect_silences, detect_silences_multires,
+                                                  envelogram, find_zero_crossings, shannon_energy)
+from test_nrp_chunked import speech_like
+
+FS = 16000
+
+
+def silence_mask(intervals, n):
+    mask = np.zeros(n, dtype=bool)
+    for start, end in intervals:
+        mask[start:end] = True
+    return mask
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("window_move", [80, 800])
+def test_hop_one_equals_detect_silences(seed, window_move):
+    signal = speech_like(FS, 20, seed)
+    assert detect_silences_multires(signal, window_move, hop=1) == detect_silences(signal, window_move, backend="numpy")
+
+
+@pytest.mark.parametrize("hop", [4, 16, 64])
+@pytest.mark.parametrize("window_move", [80, 800])
+def test_boundary_error_is_bounded(hop, window_move):
+    signal = speech_like(FS, 20, seed=0)
+    n = len(signal)
+    reference = detect_silences(signal, window_move, backend="numpy")
+    intervals = detect_silences_multires(signal, window_move, hop)
+    assert len(intervals) > 0
+    # Every boundary is within a hop of a zero crossing of the sample-rate envelogram
+    envelogram_wave = envelogram(avr_energy(shannon_energy(signal), window_move))
+    crossings = np.concatenate([[0], find_zero_crossings(envelogram_wave), [n - 1]])
+    boundaries = np.asarray(intervals).ravel()
+    assert np.abs(boundaries[:, None] - crossings[None, :]).min(axis=1).max() < hop
+    # and each interval is a negative lobe at the sample rate (some hops hold several crossings)
+    cumulative = np.concatenate([[0.], np.cumsum(envelogram_wave)])
+    assert all(cumulative[end] - cumulative[start] < 0 for start, end in intervals)
+    # Only the lobes shorter than a hop are missed
+    assert np.mean(silence_mask(intervals, n) == silence_mask(reference, n)) > 0.99
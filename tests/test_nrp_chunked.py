@@ -0,0 +1,46 @@
+"""
+nrp_filter_chunked against a single stationary gate over the whole signal and against nrp_filter,
+at the sample rates of the corpus: the stated tolerances must not depend on fs.
+"""
+import numpy as np
+import noisereduce as nr
+import pytest
+
+from fonoSemillIAS.preproc.othersFilters import nrp_filter, nrp_filter_chunked
+
+
+def speech_like(fs, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    n = int(fs * seconds)
+    signal = np.zeros(n)
+    position = 0
+    while position < n:
+        samples = np.arange(min(int(rng.uniform(0.3, 2.0) * fs), n - position))
+        envelope = (0.5 + 0.5 * np.sin(2 * np.pi * 4 * samples / fs)) ** 2
+        signal[position:position + len(samples)] = np.sin(2 * np.pi * rng.uniform(100, 250) * samples / fs) * envelope
+        position += len(samples) + int(rng.uniform(0.1, 1.5) * fs)
+    signal += 0.05 * rng.normal(size=n)
+    return signal / np.max(np.abs(signal))
+
+
+def relative_rms(output, reference):
+    return np.sqrt(np.mean((output - reference) ** 2)) / np.sqrt(np.mean(reference ** 2))
+
+
+@pytest.mark.parametrize("fs", [16000, 44100, 48000])
+def test_tolerance(fs):
+    # Longer than one 30 s chunk and than the 600000-sample blocks of noisereduce at every fs
+    signal = speech_like(fs, 65)
+    single = nr.reduce_noise(y=signal, sr=fs, y_noise=signal[:600000], n_std_thresh_stationary=0.5,
+                             stationary=True, chunk_size=len(signal))
+    chunked = nrp_filter_chunked(signal, fs, 0.5)
+
+    assert chunked.shape == signal.shape
+    assert relative_rms(chunked, single) < 1e-3
+    assert relative_rms(chunked, nrp_filter(signal, fs, 0.5)) < 5e-2
+
+
+def test_process_pool_matches_serial():
+    signal = speech_like(16000, 65)
+    np.testing.assert_allclose(nrp_filter_chunked(signal, 16000, 0.5, n_jobs=2),
+                               nrp_filter_chunked(signal, 16000, 0.5), rtol=0, atol=1e-12)
@@ -0,0 +1,100 @@
+"""
+ModelRegistry with tiny randomly initialized torch models: each key is loaded once and shared,
+evicted models are loaded again, and the stats report the load time and the memory of the model.
+"""
+import threading
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from fonoSemillIAS.STT.registry import ModelRegistry
+
+
+class Loader():
+    """
+    Loader of a small model (linear layer + batch norm), counting its calls.
+    """
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return torch.nn.Sequential(torch.nn.Linear(16, 8), torch.nn.BatchNorm1d(8))
+
+
+def test_loaded_once_and_shared():
+    registry = ModelRegistry()
+    loader = Loader()
+    first = registry.get(("tiny", "float32", "cpu"), loader)
+    second = registry.get(("tiny", "float32", "cpu"), loader)
+    assert first is second
+    assert loader.calls == 1
+    assert ("tiny", "float32", "cpu") in registry
+    assert registry.stats()[("tiny", "float32", "cpu")]["hits"] == 1
+
+    # Another key is another model
+    other = registry.get(("tiny", "float64", "cpu"), lambda: loader().double())
+    assert other is not first
+    assert loader.calls == 2
+    assert sorted(registry.keys()) == [("tiny", "float32", "cpu"), ("tiny", "float64", "cpu")]
+
+
+def test_concurrent_get_loads_once():
+    registry = ModelRegistry()
+    loader = Loader(delay=0.05)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.get(("tiny",), loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loader.calls == 1
+    assert all(model is models[0] for model in models)
+
+
+def test_evict_reloads():
+    registry = ModelRegistry()
+    loader = Loader()
+    first = registry.get(("tiny",), loader)
+    assert registry.evict(("tiny",))
+    assert not registry.evict(("tiny",))
+    assert ("tiny",) not in registry and registry.stats() == {}
+
+    second = registry.get(("tiny",), loader)
+    assert second is not first
+    assert loader.calls == 2
+
+    registry.get(("tiny", 2), loader)
+    assert registry.evict()
+    assert registry.keys() == []
+
+
+def test_stats():
+    registry = ModelRegistry()
+    registry.get(("tiny",), Loader(delay=0.05))
+    # A model and its processor, as the transformers wrappers store them
+    registry.get(("pair",), lambda: (Loader()(), object()))
+    stats = registry.stats()
+
+    # Linear 16x8 + bias, batch norm weight, bias, running mean/var and num_batches_tracked
+    parameters_bytes = (16 * 8 + 8) * 4 + 2 * 8 * 4 + 2 * 8 * 4 + 8
+    assert stats[("tiny",)]["parameters_bytes"] == parameters_bytes
+    assert stats[("pair",)]["parameters_bytes"] == parameters_bytes
+    assert stats[("tiny",)]["load_time_s"] >= 0.05
+    assert stats[("tiny",)]["hits"] == 0
+    rss_delta = stats[("tiny",)]["rss_delta_bytes"]
+    assert rss_delta is None or isinstance(rss_delta, int)
+
+    # stats returns copies
+    stats[("tiny",)]["hits"] = 10
+    assert registry.stats()[("tiny",)]["hits"] == 0
+
+
+def test_lock_per_key():
+    registry = ModelRegistry()
+    assert registry.lock(("tiny",)) is registry.lock(("tiny",))
+    assert registry.lock(("tiny",)) is not registry.lock(("other",))
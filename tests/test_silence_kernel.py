@@ -0,0 +1,65 @@
+"""
+detect_silences must return exactly the intervals of the original step-by-step detector
+(per-lobe Python loop) with every backend.
+"""
+import warnings
+
+import numpy as np
+import pytest
+
+from fonoSemillIAS.Silence import activateEnergy as ae
+
+FS = 16000
+BACKENDS = ["numpy", pytest.param("numba", marks=pytest.mark.skipif(ae.njit is None, reason="numba is not installed"))]
+
+
+def original_loop(signal, window_move):
+    average_energy = ae.avr_energy(ae.shannon_energy(signal), window_move, method="loop")
+    envelogram = ae.envelogram(average_energy)
+    zero_crossings = ae.find_zero_crossings(envelogram)
+    lobes, start = [], 0
+    for zero_crossing in zero_crossings:
+        lobes.append((start, zero_crossing))
+        start = zero_crossing
+    lobes.append((start, len(envelogram) - 1))
+    return [(i, j) for i, j in lobes if np.mean(envelogram[i:j]) < 0]
+
+
+def speech_like(seconds, rng):
+    n = int(seconds * FS)
+    signal = np.zeros(n)
+    position = 0
+    while position < n:
+        samples = np.arange(min(int(rng.uniform(0.3, 1.0) * FS), n - position))
+        envelope = (0.5 + 0.5 * np.sin(2 * np.pi * 4 * samples / FS)) ** 2
+        signal[position:position + len(samples)] = np.sin(2 * np.pi * rng.uniform(100, 250) * samples / FS) * envelope
+        position += len(samples) + int(rng.uniform(0.1, 0.8) * FS)
+    signal += 0.01 * rng.normal(size=n)
+    return signal / np.max(np.abs(signal))
+
+
+def cases():
+    rng = np.random.default_rng(0)
+    yield "speech", speech_like(5, rng), 80
+    yield "speech w=2", speech_like(2, rng), 2
+    yield "white noise", rng.uniform(-1, 1, 2 * FS), 2
+    yield "silence then noise", np.concatenate([np.zeros(5000), rng.uniform(-1, 1, 5000)]), 40
+    yield "zeros", np.zeros(1000), 80
+    for n in [1, 2, 3, 10]:
+        for window_move in [0, 1, 2, 80]:
+            signal = rng.normal(size=n)
+            yield f"short n={n} w={window_move}", signal / np.max(np.abs(signal)), window_move
+
+
+CASES = list(cases())
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("name, signal, window_move", CASES, ids=[case[0] for case in CASES])
+def test_backends_match_original_loop(backend, name, signal, window_move):
+    with warnings.catch_warnings():
+        # Constant envelograms (zeros, one sample) divide by a zero standard deviation
+        warnings.simplefilter("ignore", RuntimeWarning)
+        expected = original_loop(signal, window_move)
+        intervals = ae.detect_silences(signal, window_move, backend=backend)
+    assert [tuple(map(int, interval)) for interval in intervals] == [tuple(map(int, interval)) for interval in expected]
@@ -0,0 +1,143 @@
+"""
+Silero VAD on in-memory signals: apply_silero_silences must give the model the same input as
+read_audio (PCM / full scale, channel mean, torchaudio resampling), and the streaming mode
+(StreamResampler, VADStream) the same output as the whole signal. The model is the one packaged
+with silero-vad, loaded through a local hubconf so no download is needed.
+"""
+import copy
+
+import numpy as np
+import pytest
+from scipy.io import wavfile
+from scipy.signal import resample_poly
+
+torch = pytest.importorskip("torch")
+torchaudio = pytest.importorskip("torchaudio")
+pytest.importorskip("silero_vad")
+
+from fonoSemillIAS.audio.Audio import Audio
+from fonoSemillIAS.Silence.silero_vad import SileroVAD, StreamResampler, VADStream
+
+HUBCONF = """
+from silero_vad import load_silero_vad, get_speech_timestamps, save_audio, read_audio, VADIterator, collect_chunks
+
+def silero_vad(onnx=False, **kwargs):
+    return load_silero_vad(onnx=onnx), (get_speech_timestamps, save_audio, read_audio, VADIterator, collect_chunks)
+"""
+
+
+@pytest.fixture(scope="module")
+def vad(tmp_path_factory):
+    repo_dir = tmp_path_factory.mktemp("silero")
+    (repo_dir / "hubconf.py").write_text(HUBCONF)
+    return SileroVAD(repo_dir=str(repo_dir))
+
+
+def voiced(fs, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(fs * seconds)) / fs
+    signal = 0.01 * rng.normal(size=len(t))
+    for start in np.arange(0.5, seconds - 1.5, 2.3):
+        mask = (t >= start) & (t < start + 1.2)
+        phase = 2 * np.pi * np.cumsum(120 + 30 * np.sin(2 * np.pi * 3 * t[mask])) / fs
+        envelope = np.sin(np.pi * (t[mask] - start) / 1.2)
+        signal[mask] += sum(np.sin(k * phase) / k for k in range(1, 15)) * envelope
+    return signal / np.max(np.abs(signal))
+
+
+def read_audio_input(path):
+    # What read_audio decodes: int16 / 2 ** 15, mean of the channels, torchaudio resampling
+    fs, data = wavfile.read(path)
+    waveform = torch.from_numpy(data.astype(np.float32) / 2 ** 15)
+    if waveform.ndim == 2:
+        waveform = waveform.mean(dim=1)
+    return torchaudio.transforms.Resample(fs, 16000)(waveform)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_get_pcm_is_the_pcm_scale(tmp_path, lazy):
+    pcm = (0.3 * voiced(16000, 4) * (2 ** 15 - 1)).astype(np.int16)
+    path = str(tmp_path / "mono.wav")
+    wavfile.write(path, 16000, pcm)
+    assert np.allclose(Audio(path, lazy=lazy).get_pcm(), pcm / 2 ** 15)
+
+
+def test_model_input_matches_read_audio(vad, tmp_path):
+    fs = 44100
+    pcm = (0.3 * voiced(fs, 20) * (2 ** 15 - 1)).astype(np.int16)
+    path = str(tmp_path / "voiced.wav")
+    wavfile.write(path, fs, pcm)
+    wav = Audio(path)
+    expected = read_audio_input(path)
+    assert np.allclose(vad.resample(wav.get_pcm(), fs), expected.numpy(), atol=1e-6)
+    kwargs = dict(sampling_rate=16000, threshold=0.2)
+    reference = vad.get_speech_timestamps(expected, vad.model, **kwargs)
+    assert len(reference) > 0
+    assert vad.get_speech_timestamps(torch.from_numpy(vad.resample(wav.get_pcm(), fs).astype(np.float32)),
+                                     vad.model, **kwargs) == reference
+
+
+def uneven_blocks(signal, seed):
+    rng = np.random.default_rng(seed)
+    edges = np.cumsum(rng.integers(1, 5000, size=len(signal)))
+    edges = np.concatenate([[0], edges[edges < len(signal)], [len(signal)]])
+    return [signal[start:stop] for start, stop in zip(edges[:-1], edges[1:])]
+
+
+@pytest.mark.parametrize("fs_in, fs_out", [(44100, 16000), (48000, 16000), (8000, 16000), (16000, 16000)])
+def test_stream_resampler_matches_resample_poly(fs_in, fs_out):
+    signal = voiced(fs_in, 3)
+    resampler = StreamResampler(fs_in, fs_out)
+    output = np.concatenate([resampler(block) for block in uneven_blocks(signal, 0)] + [resampler.flush()])
+    g = np.gcd(fs_in, fs_out)
+    expected = resample_poly(signal, fs_out // g, fs_in // g)
+    assert len(output) == len(expected)
+    assert np.allclose(output, expected, atol=1e-12)
+
+
+@pytest.mark.parametrize("threshold", [0.2, 0.5])
+def test_vad_stream_matches_apply_array(vad, threshold):
+    waveform = 0.3 * voiced(16000, 20, seed=1)
+    expected = vad.apply_array(waveform, 16000, threshold=threshold)
+    events = list(VADStream(vad, threshold=threshold)(uneven_blocks(waveform, 1)))
+    assert [list(event) for event in events] == [["start"], ["end"]] * (len(events) // 2)
+    segments = [{"start": start["start"], "end": end["end"]} for start, end in zip(events[::2], events[1::2])]
+    assert segments == expected
+
+
+class LevelModel():
+    """
+    Stand-in for the model: the speech probability of a window is its RMS.
+    """
+    def reset_states(self):
+        pass
+
+    def __call__(self, chunk, sampling_rate):
+        return torch.sqrt(torch.mean(chunk ** 2)).clamp(max=1.)
+
+
+def levels(fs, seconds, seed):
+    # Bursts and pauses of random lengths, some shorter than min_speech / min_silence / 2 * speech_pad
+    rng = np.random.default_rng(seed)
+    n = int(fs * seconds)
+    signal = np.zeros(n)
+    position = 0
+    while position < n:
+        length = int(rng.uniform(0.05, 1.0) * fs)
+        signal[position:position + length] = rng.choice([0.1, 0.4, 0.9]) * np.sign(rng.normal(size=min(length, n - position)))
+        position += length
+    return signal
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("speech_pad_ms", [30, 200])
+def test_vad_stream_segments_match_get_speech_timestamps(vad, seed, speech_pad_ms):
+    vad = copy.copy(vad)
+    vad.model = LevelModel()
+    waveform = levels(16000, 30, seed)
+    # With 200 ms the padding of close segments is shared
+    expected = vad.apply_array(waveform, 16000, speech_pad_ms=speech_pad_ms)
+    assert len(expected) > 5
+    events = list(VADStream(vad, speech_pad_ms=speech_pad_ms)(uneven_blocks(waveform, seed)))
+    segments = [{"start": start["start"], "end": end["end"]} for start, end in zip(events[::2], events[1::2])]
+    assert segments == expected
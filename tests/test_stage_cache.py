@@ -0,0 +1,38 @@
+"""
+StageCache: hits and misses, and workers storing the same results at the same time.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fonoSemillIAS.others.stage_cache import StageCache
+
+
+def test_run_hit_and_miss(tmp_path):
+    cache = StageCache(str(tmp_path))
+    signal = np.arange(100, dtype=np.float64)
+    parent = cache.content_key(signal)
+    value, key = cache.run(parent, "double", {"factor": 2}, lambda: signal * 2)
+    cached, cached_key = cache.run(parent, "double", {"factor": 2}, lambda: None)
+    assert cached_key == key and np.array_equal(cached, value)
+    table, _ = cache.run(key, "table", {}, lambda: pd.DataFrame({"start_sample": [0, 10]}))
+    assert cache.run(key, "table", {}, lambda: None)[0].equals(table)
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_concurrent_stores_of_the_same_key(tmp_path):
+    cache = StageCache(str(tmp_path))
+    value = np.random.default_rng(0).normal(size=200000)
+    table = pd.DataFrame({"start_sample": np.arange(1000), "end_sample": np.arange(1000) + 5})
+
+    def store(k):
+        cache._store("signal", value)
+        cache._store("table", table)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(store, range(32)))
+    assert np.array_equal(cache._load(cache._find("signal")), value)
+    assert cache._load(cache._find("table")).equals(table)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]